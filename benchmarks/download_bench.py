@@ -0,0 +1,102 @@
+"""\
+Compares downloading one large artifact in a single stream
+and in concurrent byte ranges (see `--download-segments`)
+from a local server that limits the rate of each connection,
+like a CDN edge or a link with a large bandwidth-delay product does.
+
+Usage:
+  python benchmarks/download_bench.py [--size 256M] [--rate 32M] [--segments 1,2,4,8]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from pipfreeze2nix.cli import byte_size
+from pipfreeze2nix.download import fetch_artifact
+from pipfreeze2nix.transport import Transport
+
+BLOCK_SIZE = 64 * 1024
+
+
+def make_handler(contents: bytes, rate: int) -> type[BaseHTTPRequestHandler]:
+    class ThrottledRangeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            start, end = 0, len(contents) - 1
+            if (range_header := self.headers.get("Range")) is not None:
+                first, _, last = range_header.removeprefix("bytes=").partition("-")
+                start, end = int(first), int(last or end)
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{end}/{len(contents)}"
+                )
+            else:
+                self.send_response(200)
+            self.send_header("ETag", '"bench"')
+            self.send_header("Content-Length", str(end + 1 - start))
+            self.end_headers()
+
+            began = time.perf_counter()
+            for offset in range(start, end + 1, BLOCK_SIZE):
+                self.wfile.write(contents[offset : min(offset + BLOCK_SIZE, end + 1)])
+                ahead = (offset + BLOCK_SIZE - start) / rate - (
+                    time.perf_counter() - began
+                )
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        def log_message(self, *args):
+            pass
+
+    return ThrottledRangeHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=byte_size, default="256M")
+    parser.add_argument(
+        "--rate", type=byte_size, default="32M", help="Bytes per second per connection."
+    )
+    parser.add_argument("--segments", default="1,2,4,8")
+    args = parser.parse_args()
+
+    contents = os.urandom(args.size)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(contents, max(args.rate, 1))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/artifact.whl"
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for segments in map(int, args.segments.split(",")):
+                path = Path(tmp) / f"{segments}.part"
+                start = time.perf_counter()
+                fetch_artifact(
+                    url,
+                    path,
+                    Transport(),
+                    expected_size=len(contents),
+                    segments=segments,
+                    segment_threshold=0,
+                )
+                elapsed = time.perf_counter() - start
+                print(
+                    f"segments {segments:2}: {elapsed:7.2f}s "
+                    f"{len(contents) / elapsed / 1024**2:8.1f} MiB/s"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
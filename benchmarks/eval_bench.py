@@ -0,0 +1,122 @@
+"""\
+Compares the two output formats (see `--output-format`)
+for a synthetic environment: the time to write them, their size,
+and, when `nix-instantiate` is on the PATH, the time Nix takes to evaluate them.
+
+Evaluation stubs out nixpkgs, so it measures parsing and evaluating
+the generated files themselves rather than building derivations.
+
+Usage:
+  python benchmarks/eval_bench.py [--packages 600] [--repeat 5] [--systems 1]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from fake_index import generate_requirements
+
+import pipfreeze2nix
+from pipfreeze2nix.hashes import to_sri
+from pipfreeze2nix.lockfile import LockedArtifact
+from pipfreeze2nix.pip_compile_parser import parse_compiled_lines
+from pipfreeze2nix.pip_compile_parser import sorted_reverse_topological
+from pipfreeze2nix.platforms import SYSTEMS
+
+EVAL_EXPR = """\
+let
+  packages = import {path} {{
+    python = {{ pkgs.buildPythonPackage = attrs: attrs; }};
+    nixpkgs = {{
+      fetchurl = attrs: attrs;
+      stdenv.hostPlatform.system = "{system}";
+    }};
+  }};
+in
+map (package: package.pname + package.src.hash) packages
+"""
+
+
+def synthetic_resolved(
+    count: int, systems: int
+) -> list[pipfreeze2nix.ResolvedRequirement]:
+    requirement_trees = sorted_reverse_topological(
+        parse_compiled_lines(generate_requirements(count).splitlines())
+    )
+    resolved = []
+    for tree in requirement_trees:
+        artifacts = {}
+        for system in list(SYSTEMS)[:systems]:
+            filename = f"{tree.req.name}-{system}.whl"
+            digest = hashlib.sha256(filename.encode()).hexdigest()
+            artifacts[system] = LockedArtifact(
+                url=f"https://files.example.com/packages/{digest[:2]}/{filename}",
+                hash=to_sri("sha256", digest),
+                artifact_format="wheel",
+            )
+        resolved.append(
+            pipfreeze2nix.ResolvedRequirement(
+                requirement_tree=tree, artifacts=artifacts
+            )
+        )
+    return resolved
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packages", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--systems", type=int, default=1, choices=range(1, 5))
+    args = parser.parse_args()
+
+    resolved = synthetic_resolved(args.packages, args.systems)
+    nix_instantiate = shutil.which("nix-instantiate")
+    if nix_instantiate is None:
+        print("nix-instantiate is not on the PATH, skipping evaluation.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for output_format in pipfreeze2nix.OUTPUT_FORMATS:
+            directory = Path(tmp) / output_format
+            directory.mkdir()
+            out_file = directory / "requirements.nix"
+            write_time = best_of(
+                args.repeat,
+                lambda: pipfreeze2nix.write_output(out_file, resolved, output_format),
+            )
+            size = sum(path.stat().st_size for path in directory.iterdir())
+            line = (
+                f"{output_format:<5} write {write_time * 1000:7.1f}ms "
+                f"size {size / 1024:7.0f} KiB"
+            )
+
+            if nix_instantiate is not None:
+                expr = EVAL_EXPR.format(path=out_file, system=next(iter(SYSTEMS)))
+                eval_time = best_of(
+                    args.repeat,
+                    lambda: subprocess.run(
+                        [nix_instantiate, "--eval", "--strict", "-E", expr],
+                        check=True,
+                        stdout=subprocess.DEVNULL,
+                    ),
+                )
+                line += f" eval {eval_time * 1000:7.1f}ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""\
+A local, synthetic PEP 503 / PEP 691 index for benchmarking pipfreeze2nix
+without touching the network.
+
+Every package `package-<i>` has `versions` releases,
+each with a pure-python wheel, a few platform wheels and an sdist.
+Artifacts are deterministic bytes derived from their filename,
+so their sha256 is stable between runs.
+
+The server runs in its own process,
+so that serving pages does not compete with pipfreeze2nix for the GIL.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Iterator
+
+PLATFORM_TAGS = (
+    "cp310-cp310-manylinux_2_17_aarch64",
+    "cp310-cp310-macosx_11_0_arm64",
+    "cp310-cp310-win_amd64",
+)
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    # Seconds to sleep before answering every request.
+    latency: float = 0.0
+    # Releases listed on every project page.
+    versions: int = 20
+    # Size of every artifact in bytes.
+    artifact_size: int = 16 * 1024
+    # Fraction of files whose sha256 is published on the project page.
+    hash_fraction: float = 1.0
+    # Serve PEP 691 JSON to clients that ask for it.
+    json_api: bool = True
+
+
+def package_version(i: int) -> str:
+    return f"1.0.{i % 7}"
+
+
+def release_versions(config: IndexConfig, i: int) -> list[str]:
+    pinned = package_version(i)
+    versions = [f"0.{minor}.0" for minor in range(config.versions - 1)]
+    return versions + [pinned]
+
+
+def filenames(config: IndexConfig, name: str, i: int) -> Iterator[str]:
+    module = name.replace("-", "_")
+    for version in release_versions(config, i):
+        yield f"{module}-{version}-py3-none-any.whl"
+        for tag in PLATFORM_TAGS:
+            yield f"{module}-{version}-{tag}.whl"
+        yield f"{name}-{version}.tar.gz"
+
+
+def artifact_bytes(filename: str, size: int) -> bytes:
+    block = hashlib.sha256(filename.encode()).digest()
+    return (block * (size // len(block) + 1))[:size]
+
+
+@functools.lru_cache(maxsize=1024)
+def project_files(config: IndexConfig, name: str, i: int) -> list[dict]:
+    files = []
+    for filename in filenames(config, name, i):
+        digest = hashlib.sha256(artifact_bytes(filename, config.artifact_size))
+        files.append(
+            {
+                "filename": filename,
+                "url": f"../../files/{filename}",
+                "hashes": (
+                    {"sha256": digest.hexdigest()} if has_hash(config, filename) else {}
+                ),
+                "size": config.artifact_size,
+            }
+        )
+    return files
+
+
+def has_hash(config: IndexConfig, filename: str) -> bool:
+    return random.Random(f"hash:{filename}").random() < config.hash_fraction
+
+
+class FakeIndexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, and with Nagle's algorithm
+    # the body would wait for the client's delayed ACK, 40ms on Linux.
+    disable_nagle_algorithm = True
+    config = IndexConfig()
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send_body(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.config.latency:
+            time.sleep(self.config.latency)
+
+        parts = [part for part in self.path.split("/") if part]
+        if len(parts) == 2 and parts[0] == "simple":
+            self.serve_project(parts[1])
+        elif len(parts) == 2 and parts[0] == "files":
+            body = artifact_bytes(parts[1], self.config.artifact_size)
+            self.send_body(body, "application/octet-stream")
+        else:
+            self.send_error(404)
+
+    def serve_project(self, name: str) -> None:
+        try:
+            i = int(name.rpartition("-")[2])
+        except ValueError:
+            self.send_error(404)
+            return
+
+        files = project_files(self.config, name, i)
+        accept = self.headers.get("Accept", "")
+        if self.config.json_api and "application/vnd.pypi.simple.v1+json" in accept:
+            body = json.dumps(
+                {"meta": {"api-version": "1.1"}, "name": name, "files": files}
+            )
+            self.send_body(body.encode(), "application/vnd.pypi.simple.v1+json")
+            return
+
+        anchors = []
+        for file in files:
+            fragment = ""
+            if "sha256" in file["hashes"]:
+                fragment = f"#sha256={file['hashes']['sha256']}"
+            anchors.append(
+                f'<a href="{file["url"]}{fragment}">{file["filename"]}</a><br/>'
+            )
+        body = "<!DOCTYPE html><html><body>\n" + "\n".join(anchors) + "\n</body></html>"
+        self.send_body(body.encode(), "text/html")
+
+
+def serve(config: IndexConfig, ports: multiprocessing.Queue) -> None:
+    handler = type("ConfiguredHandler", (FakeIndexHandler,), {"config": config})
+    # The default backlog of 5 drops the connections of concurrent clients,
+    # which then retry their SYN a second later.
+    server_class = type(
+        "FakeIndexServer", (ThreadingHTTPServer,), {"request_queue_size": 1024}
+    )
+    server = server_class(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+class FakeIndex:
+    """\
+    Runs a FakeIndexHandler on an ephemeral local port in a child process.
+    """
+
+    def __init__(self, config: IndexConfig):
+        self.ports: multiprocessing.Queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=serve, args=(config, self.ports), daemon=True
+        )
+        self.port = 0
+
+    @property
+    def index_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/simple/"
+
+    def __enter__(self) -> FakeIndex:
+        self.process.start()
+        self.port = self.ports.get(timeout=10)
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.process.terminate()
+        self.process.join()
+
+
+def generate_requirements(count: int, seed: int = 0) -> str:
+    """\
+    Generates pip-compile output for `count` packages.
+
+    Dependencies only point at packages with a higher index, so the graph is acyclic,
+    and are drawn with a bias towards low indices beyond the depender,
+    so that a few packages are depended on by many others, like in real environments.
+    """
+
+    rng = random.Random(seed)
+    direct = max(1, count // 10)
+    depended_on_by: list[set[str]] = [set() for _ in range(count)]
+    for i in range(count):
+        remaining = count - i - 1
+        for _ in range(min(remaining, rng.randint(0, 4))):
+            j = i + 1 + int(remaining * rng.random() ** 3)
+            depended_on_by[j].add(f"package-{i}")
+
+    lines = [
+        "#",
+        "# This file is autogenerated by pip-compile with Python 3.10",
+        "# by the following command:",
+        "#",
+        "#    pip-compile",
+        "#",
+        "",
+    ]
+    for i in range(count):
+        lines.append(f"package-{i}=={package_version(i)}")
+        annotations = sorted(depended_on_by[i])
+        if i < direct or not annotations:
+            annotations.insert(0, "-r requirements.in")
+        if len(annotations) == 1:
+            lines.append(f"    # via {annotations[0]}")
+        else:
+            lines.append("    # via")
+            lines.extend(f"    #   {annotation}" for annotation in annotations)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,137 @@
+"""\
+Compares parsing a project page through the PEP 503 HTML parser
+against the PEP 691 JSON parser,
+and parsing every artifact against parsing only those of one pinned version,
+in time and in peak memory.
+
+Usage:
+  python benchmarks/parse_bench.py [--files N] [--repeat N]
+  python benchmarks/parse_bench.py --html page.html --json page.json
+
+Without recorded pages, a synthetic page shaped like PyPI's page for
+a project with many releases and wheels (e.g. grpcio) is generated.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from packaging.version import Version
+
+from pipfreeze2nix import pep503
+from pipfreeze2nix.index_cache import CachedPage
+
+PACKAGE_URL = "https://pypi.org/simple/someproject/"
+
+
+def synthetic_files(count: int) -> list[dict]:
+    files = []
+    for i in range(count):
+        filename = (
+            f"someproject-1.{i // 40}.{i % 40}-cp311-cp311-manylinux_2_17_x86_64.whl"
+        )
+        digest = hashlib.sha256(filename.encode()).hexdigest()
+        files.append(
+            {
+                "filename": filename,
+                "url": f"https://files.pythonhosted.org/packages/{digest[:2]}/{digest[2:4]}/{digest}/{filename}",
+                "hashes": {"sha256": digest},
+                "size": 1000 + i,
+                "requires-python": ">=3.7",
+            }
+        )
+    return files
+
+
+def render_html(files: list[dict]) -> str:
+    anchors = "\n".join(
+        f'<a href="{file["url"]}#sha256={file["hashes"]["sha256"]}" '
+        f'data-requires-python="&gt;=3.7">{file["filename"]}</a><br />'
+        for file in files
+    )
+    return f"<!DOCTYPE html>\n<html><body>\n{anchors}\n</body></html>\n"
+
+
+def render_json(files: list[dict]) -> str:
+    return json.dumps(
+        {"meta": {"api-version": "1.1"}, "name": "someproject", "files": files}
+    )
+
+
+def best_of(repeat: int, fn: Callable[[], list[pep503.Artifact]]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(fn: Callable[[], list[pep503.Artifact]]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--html", type=Path, help="A recorded PEP 503 page.")
+    parser.add_argument("--json", type=Path, help="A recorded PEP 691 page.")
+    parser.add_argument(
+        "--version",
+        type=Version,
+        default=Version("1.0.0"),
+        help="Pinned version to parse the artifacts of.",
+    )
+    args = parser.parse_args()
+
+    if args.html and args.json:
+        html_body = args.html.read_bytes()
+        json_body = args.json.read_bytes()
+    else:
+        files = synthetic_files(args.files)
+        html_body = render_html(files).encode()
+        json_body = render_json(files).encode()
+
+    html_page = CachedPage(None, None, 0, "text/html")
+    json_page = CachedPage(None, None, 0, pep503.PEP691_CONTENT_TYPE)
+
+    def parse(page: CachedPage, body: bytes, version: Version | None = None):
+        version_filter = None if version is None else pep503.VersionFilter(version)
+        # Fed in chunks, like a page read from the network or the index cache.
+        chunks = [
+            body[start : start + pep503.STREAM_CHUNK_SIZE]
+            for start in range(0, len(body), pep503.STREAM_CHUNK_SIZE)
+        ]
+        return lambda: pep503.parse_page(PACKAGE_URL, page, chunks, version_filter)
+
+    print(f"{'':<14} {'all artifacts':>22} {f'version {args.version}':>22}")
+    times = {}
+    for label, page, body in (
+        ("html", html_page, html_body),
+        ("json", json_page, json_body),
+    ):
+        times[label] = best_of(args.repeat, parse(page, body))
+        filtered = best_of(args.repeat, parse(page, body, args.version))
+        print(
+            f"{label} {len(body) / 1024:6.0f} KiB "
+            f"{times[label] * 1000:9.1f}ms "
+            f"{peak_memory(parse(page, body)) / 1024:7.0f} KiB "
+            f"{filtered * 1000:9.1f}ms "
+            f"{peak_memory(parse(page, body, args.version)) / 1024:7.0f} KiB"
+        )
+    print(f"json speedup: {times['html'] / times['json']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""\
+Measures how parsing pip-compile output scales with the size of the file,
+comparing the single-pass parser against segmenting the file first
+and parsing each segment afterwards.
+
+Usage:
+  python benchmarks/parser_bench.py [--sizes 1000,10000,50000]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import time
+
+from pipfreeze2nix import pip_compile_parser
+
+
+def generate_requirements(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    lines = [
+        "#",
+        "# This file is autogenerated by pip-compile with Python 3.10",
+        "#",
+        "--index-url https://pypi.org/simple/",
+        "",
+    ]
+    for i in range(count):
+        lines.append(f"package-{i}=={rng.randint(0, 30)}.{rng.randint(0, 30)}")
+        dependers = {
+            f"package-{rng.randrange(count)}" for _ in range(rng.randint(0, 3))
+        }
+        if not dependers:
+            lines.append("    # via -r requirements.in")
+        elif len(dependers) == 1:
+            lines.append(f"    # via {dependers.pop()}")
+        else:
+            lines.append("    # via")
+            lines.extend(f"    #   {depender}" for depender in sorted(dependers))
+    return lines
+
+
+def segmented_parse(lines: list[str]) -> None:
+    segments = pip_compile_parser.segment_compiled_requirements(lines)
+    for segment in segments:
+        pip_compile_parser.parse_segment(segment)
+
+
+def single_pass_parse(lines: list[str]) -> None:
+    pip_compile_parser.parse_compiled_lines(iter(lines))
+
+
+def best_of(repeat: int, fn, lines: list[str]) -> float:
+    # Like timeit, keep the garbage collector from adding noise to the timings.
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn(lines)
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'packages':>10} {'lines':>8} {'segmented':>12} {'single-pass':>12} {'us/line':>8}"
+    )
+    for size in map(int, args.sizes.split(",")):
+        lines = generate_requirements(size)
+        segmented = best_of(args.repeat, segmented_parse, lines)
+        single_pass = best_of(args.repeat, single_pass_parse, lines)
+        print(
+            f"{size:>10} {len(lines):>8} {segmented * 1000:>10.1f}ms "
+            f"{single_pass * 1000:>10.1f}ms {single_pass / len(lines) * 1e6:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
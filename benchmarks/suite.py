@@ -0,0 +1,238 @@
+"""\
+End-to-end benchmark suite against a local fake index (see fake_index.py).
+
+Each scenario generates a pip-compile requirements file,
+then times every phase of a run separately
+(parse, topo-sort, index-fetch, hash, render)
+followed by a complete `pipfreeze2nix` invocation.
+The minimum of `--repeat` runs is reported.
+
+Results can be saved as a baseline, which later runs are compared against:
+any phase that is slower than its baseline by more than `--tolerance`
+(and by more than `--min-delta` seconds) makes the run exit non-zero.
+Timings depend on the machine, so no baseline is committed:
+record one with `--save-baseline` on the machine that runs the comparison,
+before the change being measured, and record it again the same way
+whenever a slowdown is intended or the machine changes.
+Without a baseline recorded with the same index configuration
+for every scenario, the run exits with status 2,
+unless `--no-baseline` asks for the timings alone.
+
+Usage:
+  python benchmarks/suite.py [--scenarios small,medium,large]
+                             [--latency 0.001] [--hash-fraction 0.5]
+                             [--baseline benchmarks/baseline.json]
+                             [--save-baseline | --no-baseline]
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fake_index import FakeIndex
+from fake_index import generate_requirements
+from fake_index import IndexConfig
+
+import pipfreeze2nix
+from pipfreeze2nix import pep503
+from pipfreeze2nix.lockfile import LockedArtifact
+from pipfreeze2nix.pip_compile_parser import parse_compiled_requirements
+from pipfreeze2nix.pip_compile_parser import sorted_reverse_topological
+from pipfreeze2nix.transport import Transport
+
+SCENARIOS = {
+    "small": 10,
+    "medium": 1_000,
+    "large": 20_000,
+}
+
+PHASES = ("parse", "topo-sort", "index-fetch", "hash", "render", "end-to-end")
+
+
+def time_phases(requirements_txt: Path, jobs: int) -> dict[str, float]:
+    timings: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def phase(name: str):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    with phase("parse"):
+        requirement_trees = parse_compiled_requirements(requirements_txt)
+
+    with phase("topo-sort"):
+        requirement_trees = sorted_reverse_topological(requirement_trees)
+
+    options = pipfreeze2nix.ResolveOptions(transport=Transport())
+    ((system, tag_priorities),) = options.targets.items()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        with phase("index-fetch"):
+            all_artifacts = list(
+                executor.map(
+                    lambda tree: pep503.get_artifacts(
+                        tree.req.name,
+                        None,
+                        options.transport,
+                        version=pipfreeze2nix.parse_pinned_version(tree.req),
+                    ),
+                    requirement_trees,
+                )
+            )
+
+        def lock(tree, artifacts) -> pipfreeze2nix.ResolvedRequirement:
+            artifact = pipfreeze2nix.select_artifact(
+                artifacts, tree.req, tag_priorities
+            )
+            locked_artifact = LockedArtifact(
+                url=artifact.url,
+                hash=pipfreeze2nix.get_artifact_hash(artifact, options),
+                artifact_format="wheel" if artifact.is_wheel else "setuptools",
+            )
+            return pipfreeze2nix.ResolvedRequirement(
+                requirement_tree=tree, artifacts={system: locked_artifact}
+            )
+
+        with phase("hash"):
+            resolved = list(executor.map(lock, requirement_trees, all_artifacts))
+
+    with phase("render"):
+        pipfreeze2nix.render_requirements_nix(resolved)
+
+    with phase("end-to-end"), open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stderr(devnull):
+            pipfreeze2nix.main(
+                [
+                    "pipfreeze2nix",
+                    str(requirements_txt),
+                    f"--jobs={jobs}",
+                    "--hash-only",
+                    "--no-index-cache",
+                    "--no-resolution-db",
+                ]
+            )
+
+    return timings
+
+
+def run_scenario(
+    count: int, config: IndexConfig, jobs: int, repeat: int
+) -> dict[str, float]:
+    best: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp, FakeIndex(config) as index:
+        requirements_txt = Path(tmp) / "requirements.txt"
+        requirements_txt.write_text(generate_requirements(count))
+        os.environ["PIP_INDEX_URL"] = index.index_url
+        os.environ["HOME"] = tmp
+        for _ in range(repeat):
+            for name, seconds in time_phases(requirements_txt, jobs).items():
+                best[name] = min(seconds, best.get(name, seconds))
+    return best
+
+
+def find_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+    min_delta: float,
+) -> list[str]:
+    regressions = []
+    for scenario, timings in results.items():
+        for name, seconds in timings.items():
+            previous = baseline.get(scenario, {}).get(name)
+            if previous is None:
+                continue
+            if seconds > previous * (1 + tolerance) and seconds - previous > min_delta:
+                regressions.append(
+                    f"{scenario}/{name}: {seconds:.3f}s (baseline {previous:.3f}s)"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--versions", type=int, default=20)
+    parser.add_argument("--artifact-size", type=int, default=16 * 1024)
+    parser.add_argument("--hash-fraction", type=float, default=0.5)
+    parser.add_argument("--html-only", dest="json_api", action="store_false")
+    parser.add_argument(
+        "--baseline", type=Path, default=Path(__file__).parent / "baseline.json"
+    )
+    baseline_group = parser.add_mutually_exclusive_group()
+    baseline_group.add_argument("--save-baseline", action="store_true")
+    baseline_group.add_argument("--no-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    config = IndexConfig(
+        latency=args.latency,
+        versions=args.versions,
+        artifact_size=args.artifact_size,
+        hash_fraction=args.hash_fraction,
+        json_api=args.json_api,
+    )
+
+    results: dict[str, dict[str, float]] = {}
+    for scenario in args.scenarios.split(","):
+        count = SCENARIOS[scenario]
+        results[scenario] = run_scenario(count, config, args.jobs, args.repeat)
+        print(f"{scenario} ({count} packages)")
+        for name in PHASES:
+            print(f"  {name:<12} {results[scenario][name]:8.3f}s")
+
+    baseline = {}
+    if args.baseline.exists():
+        saved = json.loads(args.baseline.read_text())
+        if saved["config"] == dataclasses.asdict(config):
+            baseline = saved["results"]
+        elif not args.save_baseline:
+            print(f"{args.baseline} was recorded with a different index config.")
+
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "config": dataclasses.asdict(config),
+                    "results": {**baseline, **results},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if args.no_baseline:
+        return
+    missing = [scenario for scenario in results if scenario not in baseline]
+    if missing:
+        print(
+            f"No baseline for {', '.join(missing)} in {args.baseline}, "
+            "so regressions cannot be detected. Record one with --save-baseline, "
+            "or pass --no-baseline to only report timings."
+        )
+        sys.exit(2)
+
+    regressions = find_regressions(results, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""\
+Times sorted_reverse_topological on large synthetic dependency graphs
+and checks that the result is a valid reverse topological order.
+
+Usage:
+  python benchmarks/toposort_bench.py [--sizes 1000,10000,100000] [--cycles]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from packaging.requirements import Requirement
+
+from pipfreeze2nix.pip_compile_parser import RequirementTree
+from pipfreeze2nix.pip_compile_parser import sorted_reverse_topological
+
+
+def generate_graph(count: int, cycles: bool, seed: int = 0) -> list[RequirementTree]:
+    rng = random.Random(seed)
+    dependencies: list[set[str]] = [set() for _ in range(count)]
+    for i in range(count):
+        for _ in range(rng.randint(0, 4)):
+            j = rng.randrange(count)
+            if j > i or (cycles and rng.random() < 0.001):
+                dependencies[i].add(f"package-{j}")
+
+    return [
+        RequirementTree(
+            req=Requirement(f"package-{i}==1.0"),
+            is_direct=i < 10,
+            dependencies=frozenset(dependencies[i]),
+        )
+        for i in range(count)
+    ]
+
+
+def check_order(sorted_trees: list[RequirementTree]) -> None:
+    position = {tree.req.name: i for i, tree in enumerate(sorted_trees)}
+    for tree in sorted_trees:
+        for dependency in tree.dependencies:
+            assert position[dependency] < position[tree.req.name], tree.req.name
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument(
+        "--cycles",
+        action="store_true",
+        help="Add back edges to the graph and sort with break_cycles.",
+    )
+    args = parser.parse_args()
+
+    for size in map(int, args.sizes.split(",")):
+        requirement_trees = generate_graph(size, args.cycles)
+        edges = sum(len(tree.dependencies) for tree in requirement_trees)
+
+        start = time.perf_counter()
+        sorted_trees = sorted_reverse_topological(
+            requirement_trees, break_cycles=args.cycles
+        )
+        elapsed = time.perf_counter() - start
+
+        assert len(sorted_trees) == size
+        check_order(sorted_trees)
+        print(f"{size:>8} nodes {edges:>8} edges: {elapsed * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+# Temporary downloads older than this are assumed to belong to a dead process.
+STALE_TMP_AGE = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    entries: int
+    size: int
+    max_size: int
+
+
+@dataclass(frozen=True)
+class PruneResult:
+    removed_entries: int
+    removed_size: int
+
+
+class ArtifactCache:
+    """\
+    A content-addressed store of downloaded artifacts.
+
+    Artifacts are stored under `objects/` by their sha256,
+    and `urls/` maps the sha256 of each artifact's URL onto the sha256 of its contents.
+    Downloads land in `tmp/`, where interrupted ones are kept to be resumed,
+    and are moved into `objects/` with an atomic rename once complete,
+    so readers only ever see complete artifacts.
+    Writers and eviction hold an exclusive `flock` on `.lock`,
+    which makes the cache safe to share between several processes.
+
+    A blob's mtime is bumped every time it is used,
+    so that eviction can remove the least recently used artifacts
+    once the cache grows beyond `max_size` bytes.
+    The size of the cache is only measured once,
+    then kept as a running total of what this process added,
+    and measured again whenever that total goes over the limit.
+    """
+
+    def __init__(self, directory: Path, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.objects_dir = directory / "objects"
+        self.urls_dir = directory / "urls"
+        self.tmp_dir = directory / "tmp"
+        for path in (self.objects_dir, self.urls_dir, self.tmp_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        # Measured on the first `add`, since `stats` and `prune` don't need it.
+        self._size: int | None = None
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.directory / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def _url_path(self, url: str) -> Path:
+        return self.urls_dir / hashlib.sha256(url.encode()).hexdigest()
+
+    def _objects(self) -> list[Path]:
+        return [path for path in self.objects_dir.glob("*/*") if path.is_file()]
+
+    def get_path(self, sha256: str) -> Path | None:
+        path = self._object_path(sha256)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_sha256(self, url: str) -> str | None:
+        """\
+        Returns the sha256 of the artifact previously downloaded from `url`,
+        or None if it was never downloaded or has since been evicted.
+        """
+
+        try:
+            sha256 = self._url_path(url).read_text().strip()
+        except FileNotFoundError:
+            return None
+
+        if self.get_path(sha256) is None:
+            return None
+        return sha256
+
+    @contextlib.contextmanager
+    def partial_download(self, url: str) -> Iterator[Path]:
+        """\
+        Yields the path that `url` is downloaded to before it is added,
+        holding an exclusive `flock` on it, so that only one process
+        downloads a URL at a time.
+
+        The path is the same for every attempt at downloading `url`,
+        so an attempt that is interrupted can be resumed by the next one.
+        Whoever held the lock before may have completed the download,
+        so callers should look the URL up again once they hold it.
+        """
+
+        key = hashlib.sha256(url.encode()).hexdigest()
+        path = self.tmp_dir / f"{key}.part"
+        while True:
+            with open(path, "a") as partial_file:
+                fcntl.flock(partial_file, fcntl.LOCK_EX)
+                # The file may have been moved into the cache while we waited,
+                # in which case the lock is on the cached object: start over.
+                try:
+                    current = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if current.st_ino != os.fstat(partial_file.fileno()).st_ino:
+                    continue
+                try:
+                    yield path
+                finally:
+                    fcntl.flock(partial_file, fcntl.LOCK_UN)
+                return
+
+    def add(self, url: str, tmp_path: Path, sha256: str) -> Path:
+        """\
+        Moves a completed download from `partial_download` into the cache.
+        """
+
+        path = self._object_path(sha256)
+        with self._locked():
+            if self._size is None:
+                self._size = self._measure()
+            size = tmp_path.stat().st_size
+            try:
+                size -= path.stat().st_size
+            except FileNotFoundError:
+                pass
+            path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, path)
+            self._size += size
+
+            fd, url_tmp_name = tempfile.mkstemp(dir=self.tmp_dir)
+            with os.fdopen(fd, "w") as f:
+                f.write(sha256)
+            os.replace(url_tmp_name, self._url_path(url))
+
+            if self._size > self.max_size:
+                self._evict(self.max_size)
+        return path
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self._objects():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _measure(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, max_size: int) -> PruneResult:
+        entries = sorted(self._entries())
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed_entries = 0
+        removed_size = 0
+        for _, entry_size, path in entries:
+            if size <= max_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            removed_entries += 1
+            removed_size += entry_size
+
+        self._size = size
+        return PruneResult(removed_entries=removed_entries, removed_size=removed_size)
+
+    def stats(self) -> CacheStats:
+        objects = self._objects()
+        return CacheStats(
+            entries=len(objects),
+            size=sum(path.stat().st_size for path in objects),
+            max_size=self.max_size,
+        )
+
+    def prune(self, max_size: int | None = None) -> PruneResult:
+        """\
+        Evicts artifacts until the cache fits in `max_size` bytes
+        (by default the cache's own limit),
+        and removes dangling URL records and abandoned temporary downloads.
+        """
+
+        with self._locked():
+            result = self._evict(self.max_size if max_size is None else max_size)
+
+            for url_path in self.urls_dir.iterdir():
+                sha256 = url_path.read_text().strip()
+                if not self._object_path(sha256).exists():
+                    url_path.unlink(missing_ok=True)
+
+            now = time.time()
+            for tmp_path in self.tmp_dir.iterdir():
+                if now - tmp_path.stat().st_mtime > STALE_TMP_AGE:
+                    tmp_path.unlink(missing_ok=True)
+
+        return result
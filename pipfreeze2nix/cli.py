@@ -0,0 +1,780 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import glob
+import os
+import sys
+import time
+from pathlib import Path
+from typing import MutableMapping
+
+import requests
+
+from pipfreeze2nix import pep503
+from pipfreeze2nix.artifact_cache import ArtifactCache
+from pipfreeze2nix.download import DOWNLOAD_SEGMENTS
+from pipfreeze2nix.exceptions import DependencyCycleError
+from pipfreeze2nix.exceptions import PipFreeze2NixError
+from pipfreeze2nix.find_links import FileHasher
+from pipfreeze2nix.find_links import FindLinks
+from pipfreeze2nix.find_links import parse_url_prefix
+from pipfreeze2nix.index_cache import IndexCache
+from pipfreeze2nix.lockfile import read_json_locked_artifacts
+from pipfreeze2nix.lockfile import read_locked_artifacts
+from pipfreeze2nix.nixpkgs_index import NixpkgsIndex
+from pipfreeze2nix.pip_compile_parser import IndexOptions
+from pipfreeze2nix.pip_compile_parser import parse_compiled_requirements
+from pipfreeze2nix.pip_compile_parser import read_index_options
+from pipfreeze2nix.pip_compile_parser import RequirementTree
+from pipfreeze2nix.pip_compile_parser import sorted_reverse_topological
+from pipfreeze2nix.platforms import current_tag_priorities
+from pipfreeze2nix.platforms import host_system
+from pipfreeze2nix.platforms import system_tag_priorities
+from pipfreeze2nix.platforms import SYSTEMS
+from pipfreeze2nix.render import get_lock_file
+from pipfreeze2nix.render import get_out_file
+from pipfreeze2nix.render import OUTPUT_FORMATS
+from pipfreeze2nix.render import write_output
+from pipfreeze2nix.resolution_store import ResolutionStore
+from pipfreeze2nix.resolve import INDEX_STRATEGIES
+from pipfreeze2nix.resolve import lock_context
+from pipfreeze2nix.resolve import requirement_key
+from pipfreeze2nix.resolve import resolve_requirements
+from pipfreeze2nix.resolve import ResolvedRequirement
+from pipfreeze2nix.resolve import ResolveOptions
+from pipfreeze2nix.timings import Recorder
+from pipfreeze2nix.transport import Transport
+from pipfreeze2nix.watch import Watcher
+
+
+def get_cache_dir() -> Path:
+    return Path.home() / ".cache" / "pipfreeze2nix"
+
+
+def positive_int(value: str) -> int:
+    parsed = int(value)
+    if parsed < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer.")
+    return parsed
+
+
+def non_negative_int(value: str) -> int:
+    parsed = int(value)
+    if parsed < 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a non-negative integer.")
+    return parsed
+
+
+def nix_systems(value: str) -> tuple[str, ...]:
+    systems = tuple(system.strip() for system in value.split(",") if system.strip())
+    for system in systems:
+        if system not in SYSTEMS:
+            raise argparse.ArgumentTypeError(
+                f"{system} is not one of: {', '.join(SYSTEMS)}."
+            )
+    return systems
+
+
+def python_version(value: str) -> tuple[int, int]:
+    major, _, minor = value.partition(".")
+    if not (major.isdigit() and minor.isdigit()):
+        raise argparse.ArgumentTypeError(f"{value} is not a version like 3.10.")
+    return (int(major), int(minor))
+
+
+def url_prefix(value: str) -> tuple[str, str]:
+    try:
+        return parse_url_prefix(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def byte_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    value = value.strip().upper().removesuffix("B")
+    multiplier = 1
+    if value and value[-1] in units:
+        multiplier = units[value[-1]]
+        value = value[:-1]
+    try:
+        parsed = int(float(value) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid size.")
+    if parsed < 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid size.")
+    return parsed
+
+
+def add_artifact_cache_arguments(parser: argparse._ActionsContainer) -> None:
+    parser.add_argument(
+        "--artifact-cache-dir",
+        type=Path,
+        default=get_cache_dir() / "artifacts",
+        help="Directory in which downloaded artifacts are cached.",
+    )
+    parser.add_argument(
+        "--artifact-cache-max-size",
+        type=byte_size,
+        default="10G",
+        help="Maximum size of the artifact cache, e.g. 512M or 20G.",
+    )
+
+
+def parse_args(args: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="pipfreeze2nix",
+        description="Generate a requirements.nix file from pip-compile'd requirements.",
+    )
+    parser.add_argument(
+        "requirements_txt",
+        nargs="+",
+        help=(
+            "Paths or glob patterns of pip-compile'd requirements files. "
+            "Pins shared between files are only resolved once."
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=min(32, (os.cpu_count() or 1) + 4),
+        help="Maximum number of requirements to resolve concurrently.",
+    )
+
+    parser.add_argument(
+        "--systems",
+        type=nix_systems,
+        help=(
+            "Comma-separated nix systems to lock for in one pass, "
+            f"out of: {','.join(SYSTEMS)}. "
+            "Defaults to the wheels supported by the running interpreter."
+        ),
+    )
+    parser.add_argument(
+        "--python-version",
+        type=python_version,
+        default=sys.version_info[:2],
+        help="CPython version to lock wheels for with --systems, e.g. 3.10.",
+    )
+    parser.add_argument(
+        "--break-cycles",
+        action="store_true",
+        help=(
+            "Drop the dependencies between requirements that depend on each other "
+            "in a cycle, instead of failing."
+        ),
+    )
+    parser.add_argument(
+        "--refresh",
+        dest="reuse_locked",
+        action="store_false",
+        help=(
+            "Resolve every requirement again, instead of reusing the artifacts "
+            "of unchanged requirements from the existing output file "
+            "or the resolution database."
+        ),
+    )
+
+    parser.add_argument(
+        "--reuse-nixpkgs",
+        type=Path,
+        metavar="VERSIONS_JSON",
+        help=(
+            "JSON object of nixpkgs python package attributes and their versions. "
+            "Requirements pinned to exactly the version nixpkgs has "
+            "are taken from python.pkgs instead of being fetched and built, "
+            "with the dependencies nixpkgs builds them with."
+        ),
+    )
+
+    find_links_group = parser.add_argument_group("local artifacts")
+    find_links_group.add_argument(
+        "--find-links",
+        type=Path,
+        action="append",
+        default=[],
+        metavar="DIR",
+        help=(
+            "Directory of wheels and sdists to resolve from before the index. "
+            "Can be passed several times."
+        ),
+    )
+    find_links_group.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Only resolve from --find-links directories.",
+    )
+    find_links_group.add_argument(
+        "--url-prefix",
+        type=url_prefix,
+        action="append",
+        default=[],
+        metavar="FROM=TO",
+        help=(
+            "Rewrite URLs starting with FROM, a URL or a local directory, "
+            "to start with TO in the output, "
+            "e.g. /mnt/wheels=https://wheels.example.com/. Can be passed several times."
+        ),
+    )
+
+    artifact_cache_group = parser.add_argument_group("artifact cache")
+    artifact_cache_group.add_argument(
+        "--hash-only",
+        dest="keep_artifacts",
+        action="store_false",
+        help=(
+            "Hash artifacts that the index has no digest for "
+            "without keeping them on disk."
+        ),
+    )
+    add_artifact_cache_arguments(artifact_cache_group)
+
+    parser.add_argument(
+        "--index-strategy",
+        choices=INDEX_STRATEGIES,
+        default="first-index",
+        help=(
+            "How artifacts are chosen when requirements files list several indexes "
+            "with --index-url and --extra-index-url: from the first index "
+            "that has the project, or from all of them like pip. "
+            "Defaults to first-index."
+        ),
+    )
+
+    http_group = parser.add_argument_group("http")
+    http_group.add_argument(
+        "--max-connections-per-host",
+        type=positive_int,
+        default=10,
+        help="Maximum number of connections kept open to any one host.",
+    )
+    http_group.add_argument(
+        "--retries",
+        type=non_negative_int,
+        default=5,
+        help="Number of times a failed request is retried.",
+    )
+    http_group.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=10.0,
+        help="Seconds to wait for a connection to be established.",
+    )
+    http_group.add_argument(
+        "--read-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds to wait for a server to send data.",
+    )
+    http_group.add_argument(
+        "--download-segments",
+        type=positive_int,
+        default=DOWNLOAD_SEGMENTS,
+        help=(
+            "Number of concurrent byte ranges artifacts of at least "
+            "--segment-threshold are downloaded in, when the index publishes "
+            "their size and the server supports ranges. 1 disables it."
+        ),
+    )
+    http_group.add_argument(
+        "--segment-threshold",
+        type=byte_size,
+        default="64M",
+        help="Size from which artifacts are downloaded in segments, e.g. 64M.",
+    )
+
+    resolution_db_group = parser.add_argument_group("resolution database")
+    resolution_db_group.add_argument(
+        "--no-resolution-db",
+        dest="resolution_db",
+        action="store_false",
+        help="Don't look up or record resolved artifacts in the resolution database.",
+    )
+    resolution_db_group.add_argument(
+        "--resolution-db-path",
+        type=Path,
+        default=get_cache_dir() / "resolutions.sqlite3",
+        help="SQLite database of previously resolved artifacts.",
+    )
+
+    index_cache_group = parser.add_argument_group("index cache")
+    index_cache_group.add_argument(
+        "--no-index-cache",
+        dest="index_cache",
+        action="store_false",
+        help="Always download simple index pages.",
+    )
+    index_cache_group.add_argument(
+        "--index-cache-dir",
+        type=Path,
+        default=get_cache_dir() / "index",
+        help="Directory in which simple index pages are cached.",
+    )
+    index_cache_group.add_argument(
+        "--index-cache-ttl",
+        type=float,
+        default=3600.0,
+        help="Seconds before a cached index page is revalidated.",
+    )
+    index_cache_group.add_argument(
+        "--index-cache-max-size",
+        type=byte_size,
+        default="256M",
+        help="Maximum size of the index cache, e.g. 512M or 2G.",
+    )
+    index_cache_group.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use cached index pages and artifacts; never touch the network.",
+    )
+
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="nix",
+        help=(
+            "nix writes every package into the .nix file. "
+            "json writes them to a .lock.json file next to it instead, "
+            "and the .nix file builds the packages from that lock, "
+            "which is much smaller and faster to evaluate. "
+            "Defaults to nix."
+        ),
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep running, and regenerate the output of each requirements file "
+            "whenever it changes, only resolving the pins that changed."
+        ),
+    )
+
+    timings_group = parser.add_argument_group("timings")
+    timings_group.add_argument(
+        "--timings",
+        action="store_true",
+        help=(
+            "Print how long each step took, the slowest packages, "
+            "bytes downloaded and cache hit ratios."
+        ),
+    )
+    timings_group.add_argument(
+        "--slowest",
+        type=positive_int,
+        default=10,
+        help="Number of slowest packages listed by --timings.",
+    )
+    timings_group.add_argument(
+        "--trace",
+        type=Path,
+        help="Write a Chrome trace event file of every timed step to this path.",
+    )
+    return parser.parse_args(args)
+
+
+def merge_index_urls(index_options: list[IndexOptions]) -> list[str]:
+    """\
+    Orders the indexes of every requirements file by priority:
+    the `--index-url` they agree on, or else `PIP_INDEX_URL`,
+    followed by `PIP_EXTRA_INDEX_URL` and every `--extra-index-url` in file order.
+    """
+
+    primary = {
+        pep503.normalize_index_url(file_options.index_url)
+        for file_options in index_options
+        if file_options.index_url is not None
+    }
+    if len(primary) > 1:
+        raise SystemExit(
+            f"Requirements files use different --index-url options: "
+            f"{', '.join(sorted(primary))}."
+        )
+
+    index_urls = [primary.pop() if primary else pep503.get_index_url()]
+    index_urls += pep503.get_extra_index_urls()
+    for file_options in index_options:
+        index_urls += map(pep503.normalize_index_url, file_options.extra_index_urls)
+    return list(dict.fromkeys(index_urls))
+
+
+def make_resolve_options(
+    options: argparse.Namespace, in_files: list[Path], out_files: list[Path]
+) -> ResolveOptions:
+    if options.offline and not options.index_cache:
+        raise SystemExit("--offline cannot be used together with --no-index-cache.")
+    if options.no_index and not options.find_links:
+        raise SystemExit("--no-index requires at least one --find-links directory.")
+
+    index_cache = None
+    if options.index_cache:
+        index_cache = IndexCache(
+            options.index_cache_dir,
+            ttl=options.index_cache_ttl,
+            max_size=options.index_cache_max_size,
+            offline=options.offline,
+        )
+
+    artifact_cache = None
+    if options.keep_artifacts:
+        artifact_cache = ArtifactCache(
+            options.artifact_cache_dir,
+            max_size=options.artifact_cache_max_size,
+        )
+
+    resolution_store = None
+    if options.resolution_db:
+        resolution_store = ResolutionStore(options.resolution_db_path)
+
+    recorder = Recorder(enabled=options.timings or options.trace is not None)
+    find_links = None
+    file_hasher = None
+    if options.find_links:
+        find_links = FindLinks(options.find_links)
+        file_hasher = FileHasher(resolution_store, recorder)
+
+    nixpkgs_index = None
+    if options.reuse_nixpkgs is not None:
+        try:
+            nixpkgs_index = NixpkgsIndex.load(options.reuse_nixpkgs)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"Cannot read --reuse-nixpkgs index: {e}")
+
+    targets = {host_system(): current_tag_priorities()}
+    if options.systems:
+        targets = {
+            system: system_tag_priorities(system, options.python_version)
+            for system in options.systems
+        }
+
+    resolve_options = ResolveOptions(
+        index_cache=index_cache,
+        artifact_cache=artifact_cache,
+        offline=options.offline,
+        targets=targets,
+        python_version=options.python_version
+        if options.systems
+        else sys.version_info[:2],
+        resolution_store=resolution_store,
+        refresh=not options.reuse_locked,
+        recorder=recorder,
+        find_links=find_links,
+        no_index=options.no_index,
+        url_prefixes=options.url_prefix,
+        file_hasher=file_hasher,
+        index_urls=merge_index_urls(list(map(read_index_options, in_files))),
+        index_strategy=options.index_strategy,
+        nixpkgs_index=nixpkgs_index,
+        download_segments=options.download_segments,
+        segment_threshold=options.segment_threshold,
+        transport=Transport(
+            max_connections_per_host=options.max_connections_per_host,
+            retries=options.retries,
+            connect_timeout=options.connect_timeout,
+            read_timeout=options.read_timeout,
+        ),
+    )
+
+    # Existing output files are only reused if they were locked
+    # from the same sources, with the same URL prefixes and for the same targets.
+    if not options.reuse_locked:
+        return resolve_options
+    context = lock_context(resolve_options)
+    locked_artifacts = {}
+    for out_file in out_files:
+        locked_artifacts.update(read_locked_artifacts(out_file, context))
+        locked_artifacts.update(
+            read_json_locked_artifacts(get_lock_file(out_file), context)
+        )
+    return dataclasses.replace(resolve_options, locked_artifacts=locked_artifacts)
+
+
+def format_size(size: float) -> str:
+    units = ["B", "KiB", "MiB", "GiB", "TiB"]
+    unit = units.pop(0)
+    while size >= 1024 and units:
+        size /= 1024
+        unit = units.pop(0)
+    return f"{size:.1f}{unit}"
+
+
+CACHE_COUNTERS = {
+    "index_cache": "Index cache",
+    "artifact_cache": "Artifact cache",
+    "resolution_store": "Resolution database",
+    "lockfile": "Existing output file",
+    "file_digests": "Local file digests",
+    "nixpkgs": "Reused from nixpkgs",
+}
+
+
+def format_timings(recorder: Recorder, slowest: int) -> str:
+    spans = sorted(recorder.spans(), key=lambda span: span.start)
+    counters = recorder.counters()
+
+    durations: dict[str, list[float]] = {}
+    for span in spans:
+        durations.setdefault(span.name, []).append(span.duration)
+    lines = ["Timings (summed across threads):"]
+    for name, name_durations in durations.items():
+        lines.append(
+            f"  {name:<16} {sum(name_durations):9.3f}s  {len(name_durations)} calls"
+        )
+
+    resolves = sorted(
+        (span for span in spans if span.name == "resolve"),
+        key=lambda span: span.duration,
+        reverse=True,
+    )[:slowest]
+    if resolves:
+        lines.append(f"Slowest {len(resolves)} packages:")
+        for span in resolves:
+            lines.append(f"  {span.duration:9.3f}s  {span.args['name']}")
+
+    lines.append(
+        f"Downloaded {format_size(counters['bytes_downloaded'])}, "
+        f"spent {counters['hash_seconds']:.3f}s hashing, "
+        f"{counters['index_hash']} hashes taken from the index"
+    )
+    if counters["download_resumed"]:
+        lines.append(f"Resumed {counters['download_resumed']} interrupted downloads")
+    if counters["download_segmented"]:
+        lines.append(
+            f"Downloaded {counters['download_segmented']} artifacts in segments"
+        )
+    for prefix, label in CACHE_COUNTERS.items():
+        outcomes = {
+            counter.partition(".")[2]: count
+            for counter, count in counters.items()
+            if counter.startswith(f"{prefix}.")
+        }
+        total = sum(outcomes.values())
+        if total:
+            details = ", ".join(
+                f"{count} {outcome}" for outcome, count in outcomes.items()
+            )
+            lines.append(
+                f"{label}: {outcomes.get('hit', 0) / total:.1%} hits ({details})"
+            )
+    return "\n".join(lines)
+
+
+def cache_main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="pipfreeze2nix cache",
+        description="Inspect and prune the artifact cache.",
+    )
+    add_artifact_cache_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show the size of the artifact cache.")
+    prune_parser = subparsers.add_parser(
+        "prune",
+        help="Evict least recently used artifacts until the cache fits.",
+    )
+    prune_parser.add_argument(
+        "--max-size",
+        type=byte_size,
+        help="Size to prune down to. Defaults to --artifact-cache-max-size.",
+    )
+    options = parser.parse_args(args)
+
+    artifact_cache = ArtifactCache(
+        options.artifact_cache_dir,
+        max_size=options.artifact_cache_max_size,
+    )
+    if options.command == "stats":
+        stats = artifact_cache.stats()
+        print(f"Location: {artifact_cache.directory}")
+        print(f"Artifacts: {stats.entries}")
+        print(f"Size: {format_size(stats.size)} / {format_size(stats.max_size)}")
+    elif options.command == "prune":
+        result = artifact_cache.prune(options.max_size)
+        print(
+            f"Removed {result.removed_entries} artifacts "
+            f"({format_size(result.removed_size)})."
+        )
+
+
+def expand_requirements_files(patterns: list[str]) -> list[Path]:
+    in_files: dict[Path, None] = {}
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                raise SystemExit(f"No requirements files match `{pattern}`.")
+        else:
+            matches = [pattern]
+
+        for match in matches:
+            in_file = Path(match)
+            if not in_file.is_absolute():
+                in_file = Path.cwd() / in_file
+            in_files[in_file] = None
+    return list(in_files)
+
+
+def parse_requirements_file(
+    in_file: Path, options: argparse.Namespace, recorder: Recorder
+) -> list[RequirementTree]:
+    with recorder.span("parse", file=str(in_file)):
+        requirement_trees = parse_compiled_requirements(in_file)
+    try:
+        with recorder.span("topo-sort", file=str(in_file)):
+            return sorted_reverse_topological(requirement_trees, options.break_cycles)
+    except DependencyCycleError as e:
+        raise SystemExit(f"{e}\nPass --break-cycles to drop the cyclic dependencies.")
+
+
+def generate(
+    in_files: list[Path],
+    out_files: list[Path],
+    options: argparse.Namespace,
+    resolve_options: ResolveOptions,
+    resolved: MutableMapping[tuple[str, str], ResolvedRequirement] | None = None,
+) -> None:
+    """\
+    Writes each of `out_files` from the requirements file at the same position
+    in `in_files`, resolving pins that are not in `resolved` yet.
+    """
+
+    recorder = resolve_options.recorder
+    requirement_trees_by_file = [
+        parse_requirements_file(in_file, options, recorder) for in_file in in_files
+    ]
+    all_requirement_trees = [
+        requirement_tree
+        for requirement_trees in requirement_trees_by_file
+        for requirement_tree in requirement_trees
+    ]
+
+    all_resolved = resolve_requirements(
+        all_requirement_trees, options.jobs, resolve_options, resolved
+    )
+
+    start = 0
+    for out_file, requirement_trees in zip(out_files, requirement_trees_by_file):
+        end = start + len(requirement_trees)
+        with recorder.span("render", file=str(out_file)):
+            write_output(
+                out_file,
+                all_resolved[start:end],
+                options.output_format,
+                lock_context(resolve_options),
+            )
+        start = end
+
+    if len(in_files) > 1:
+        unique = len(set(map(requirement_key, all_requirement_trees)))
+        print(
+            f"Resolved {unique} unique requirements for "
+            f"{len(all_requirement_trees)} requirements across {len(in_files)} files "
+            f"({len(all_requirement_trees) - unique} shared)",
+            file=sys.stderr,
+        )
+
+
+def watch(
+    in_files: list[Path],
+    out_files: list[Path],
+    options: argparse.Namespace,
+    resolve_options: ResolveOptions,
+) -> None:
+    """\
+    Generates every output file, then regenerates the output of each
+    requirements file whenever its contents change, until interrupted.
+
+    Every resolution is kept in memory for the whole session,
+    so a regeneration only resolves the pins that changed.
+    Index pages are still read through the index cache,
+    since a changed pin is often a release that a page read earlier doesn't list.
+    """
+
+    resolved: dict[tuple[str, str], ResolvedRequirement] = {}
+    generate(in_files, out_files, options, resolve_options, resolved)
+    out_file_by_in_file = dict(zip(in_files, out_files))
+
+    with Watcher(in_files) as watcher:
+        print(
+            f"Watching {len(in_files)} requirements files for changes.",
+            file=sys.stderr,
+        )
+        while True:
+            changed = watcher.wait()
+            changed_in_files = [in_file for in_file in in_files if in_file in changed]
+            changed_out_files = [out_file_by_in_file[f] for f in changed_in_files]
+            start = time.perf_counter()
+            try:
+                index_urls = merge_index_urls(list(map(read_index_options, in_files)))
+                if index_urls != list(resolve_options.index_urls):
+                    # The lock was resolved from the old indexes.
+                    resolve_options = dataclasses.replace(
+                        resolve_options, index_urls=index_urls, locked_artifacts={}
+                    )
+                    resolved.clear()
+                generate(
+                    changed_in_files,
+                    changed_out_files,
+                    options,
+                    resolve_options,
+                    resolved,
+                )
+            except (
+                PipFreeze2NixError,
+                ValueError,
+                SystemExit,
+                requests.RequestException,
+                OSError,
+            ) as e:
+                # Keep watching, the next version of the file may be fine,
+                # and the index may be reachable again.
+                print(f"Could not regenerate: {e}", file=sys.stderr)
+                continue
+            print(
+                f"Regenerated {', '.join(str(f) for f in changed_out_files)} "
+                f"in {time.perf_counter() - start:.3f}s",
+                file=sys.stderr,
+            )
+
+
+def main(args: list[str]) -> None:
+    if args[1:2] == ["cache"]:
+        cache_main(args[2:])
+        return
+
+    options = parse_args(args[1:])
+    in_files = expand_requirements_files(options.requirements_txt)
+    out_files = [get_out_file(in_file) for in_file in in_files]
+    resolve_options = make_resolve_options(options, in_files, out_files)
+    recorder = resolve_options.recorder
+
+    try:
+        if options.watch:
+            with contextlib.suppress(KeyboardInterrupt):
+                watch(in_files, out_files, options, resolve_options)
+        else:
+            generate(in_files, out_files, options, resolve_options)
+    finally:
+        if resolve_options.file_hasher is not None:
+            resolve_options.file_hasher.close()
+
+    transport_stats = resolve_options.transport.stats()
+    print(
+        f"HTTP: {transport_stats.requests} requests, "
+        f"{transport_stats.connections_reused} on reused connections, "
+        f"{transport_stats.retries} retries",
+        file=sys.stderr,
+    )
+
+    if options.timings:
+        print(format_timings(recorder, options.slowest), file=sys.stderr)
+    if options.trace is not None:
+        recorder.write_trace(options.trace)
+
+
+def realmain() -> None:
+    main(sys.argv)
+
+
+if __name__ == "__main__":
+    realmain()
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO
+
+import requests
+
+from pipfreeze2nix.exceptions import DownloadError
+from pipfreeze2nix.timings import Recorder
+from pipfreeze2nix.transport import default_transport
+from pipfreeze2nix.transport import RETRY_STATUS_CODES
+from pipfreeze2nix.transport import Transport
+
+# A body that is cut short loses the chunk being read, so chunks are kept small.
+CHUNK_SIZE = 64 * 1024
+
+# Errors that can interrupt a response body half way through.
+INTERRUPTED_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+# Artifacts of at least this size are downloaded in concurrent byte ranges.
+SEGMENT_THRESHOLD = 64 * 1024 * 1024
+DOWNLOAD_SEGMENTS = 4
+# Segmented downloads request parts of this size, in order,
+# so they can be hashed in order soon after they were written.
+PART_SIZE = 8 * 1024 * 1024
+SEGMENT_CHUNK_SIZE = 1024 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+|\*)")
+
+
+def validator_path(partial_path: Path) -> Path:
+    """\
+    Where the validator of the response a partial download started from is kept,
+    so that a later run only resumes it if the file did not change since.
+    """
+
+    return partial_path.with_name(f"{partial_path.name}.validator")
+
+
+def response_validator(response: requests.Response) -> str | None:
+    """\
+    Returns a validator for `If-Range`, which only accepts strong ETags.
+    """
+
+    etag = response.headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def parse_content_range(value: str | None) -> tuple[int, int | None] | None:
+    """\
+    Parses a `Content-Range: bytes <start>-<end>/<total>` header
+    into its start and total length, which is None if unknown.
+    """
+
+    match = CONTENT_RANGE_RE.fullmatch((value or "").strip())
+    if match is None:
+        return None
+    total = None if match["total"] == "*" else int(match["total"])
+    return int(match["start"]), total
+
+
+def content_length(response: requests.Response) -> int | None:
+    value = response.headers.get("Content-Length")
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+class _Download:
+    """\
+    The state of one download, carried across the requests that resume it.
+    """
+
+    def __init__(self, f: BinaryIO | None):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.total: int | None = None
+        # Bytes received by this run, as opposed to resumed from an earlier one.
+        self.downloaded = 0
+        self.hash_seconds = 0.0
+
+    def restart(self) -> None:
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.total = None
+        if self.f is not None:
+            self.f.truncate(0)
+
+    def hash(self, chunk: bytes) -> None:
+        start = time.perf_counter()
+        self.sha256.update(chunk)
+        self.hash_seconds += time.perf_counter() - start
+        self.size += len(chunk)
+        self.downloaded += len(chunk)
+
+    def update(self, chunk: bytes) -> None:
+        self.hash(chunk)
+        if self.f is not None:
+            self.f.write(chunk)
+
+
+def preallocate(fd: int, size: int) -> None:
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Not every platform or filesystem can allocate ahead of time.
+        os.ftruncate(fd, size)
+
+
+def fetch_artifact(
+    url: str,
+    cache_path: Path | None,
+    transport: Transport | None = None,
+    recorder: Recorder | None = None,
+    expected_size: int | None = None,
+    segments: int = 1,
+    segment_threshold: int = SEGMENT_THRESHOLD,
+) -> str:
+    """\
+    Downloads the artifact at `url` and returns its sha256,
+    hashing each chunk as it arrives.
+    The artifact is only written to disk when `cache_path` is provided.
+
+    A transfer that is interrupted is resumed where it stopped
+    with a `Range` request, up to the transport's number of retries.
+    Failed connections, retryable statuses and interrupted transfers
+    all count against that one budget: the transport does not retry
+    the requests made here on its own.
+    A partial download left at `cache_path` by an earlier run is resumed too,
+    as long as the server confirms through `If-Range` that the file did not change;
+    otherwise it is downloaded from the start.
+
+    Raises DownloadError if the download is not as long as the server announced,
+    or as `expected_size`, the size published by the index.
+
+    Given several `segments`, a new download whose `expected_size`
+    is at least `segment_threshold` is fetched in that many concurrent
+    byte ranges instead (see `_fetch_segmented`), or in a single stream
+    if the server does not support ranges.
+    """
+
+    transport = transport or default_transport()
+    recorder = recorder or Recorder()
+    with contextlib.ExitStack() as stack:
+        f = None
+        validator = None
+        if cache_path is not None:
+            # Appending never overwrites what an earlier run downloaded.
+            f = stack.enter_context(open(cache_path, "a+b"))
+            with contextlib.suppress(FileNotFoundError):
+                validator = validator_path(cache_path).read_text()
+
+        download = _Download(f)
+        if f is not None and validator is not None:
+            f.seek(0)
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                download.sha256.update(chunk)
+                download.size += len(chunk)
+        elif f is not None:
+            f.truncate(0)
+
+        with recorder.span("fetch_artifact", url=url) as span_args:
+            segmented = False
+            if (
+                segments > 1
+                and validator is None
+                and expected_size is not None
+                and expected_size >= segment_threshold
+            ):
+                segmented = _fetch_segmented(
+                    url, cache_path, download, expected_size, segments, transport
+                )
+                if not segmented and f is not None:
+                    # Drop what was preallocated for the segments.
+                    f.truncate(0)
+            if segmented:
+                recorder.count("download_segmented")
+            else:
+                _transfer(url, cache_path, download, validator, transport, recorder)
+            span_args.update(
+                bytes=download.downloaded, hash_seconds=download.hash_seconds
+            )
+
+    if cache_path is not None:
+        validator_path(cache_path).unlink(missing_ok=True)
+    expected_sizes = {download.total, expected_size} - {None}
+    if any(size != download.size for size in expected_sizes):
+        if cache_path is not None:
+            cache_path.unlink(missing_ok=True)
+        raise DownloadError(
+            f"Downloaded {download.size} bytes of {url}, "
+            f"expected {' or '.join(map(str, sorted(expected_sizes)))}."
+        )
+
+    recorder.count("bytes_downloaded", download.downloaded)
+    recorder.count("hash_seconds", download.hash_seconds)
+    return download.sha256.hexdigest()
+
+
+def _transfer(
+    url: str,
+    cache_path: Path | None,
+    download: _Download,
+    validator: str | None,
+    transport: Transport,
+    recorder: Recorder,
+) -> None:
+    attempt = 0
+    while True:
+        # Byte ranges refer to the encoded body, so it must not be encoded.
+        headers = {"Accept-Encoding": "identity"}
+        if download.size:
+            headers["Range"] = f"bytes={download.size}-"
+            if validator is not None:
+                headers["If-Range"] = validator
+
+        try:
+            with transport.get(url, headers, stream=True, retries=0) as response:
+                if (
+                    response.status_code in RETRY_STATUS_CODES
+                    and attempt < transport.retries
+                ):
+                    response.close()
+                    transport.wait_to_retry(attempt, response)
+                    attempt += 1
+                    continue
+                content_range = parse_content_range(
+                    response.headers.get("Content-Range")
+                )
+                if download.size and response.status_code == 416:
+                    # Nothing is left after what was downloaded,
+                    # which may or may not be the whole file: start over.
+                    download.restart()
+                    validator = None
+                    attempt += 1
+                    if attempt > transport.retries:
+                        response.raise_for_status()
+                    continue
+                if (
+                    download.size
+                    and response.status_code == 206
+                    and content_range is not None
+                    and content_range[0] == download.size
+                ):
+                    recorder.count("download_resumed")
+                    download.total = content_range[1]
+                else:
+                    response.raise_for_status()
+                    if download.size:
+                        # The server ignored the range or the file changed.
+                        download.restart()
+                    download.total = content_length(response)
+                    validator = response_validator(response)
+                    if cache_path is not None and validator is not None:
+                        validator_path(cache_path).write_text(validator)
+
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    download.update(chunk)
+            return
+        except INTERRUPTED_ERRORS:
+            if attempt >= transport.retries:
+                raise
+            transport.wait_to_retry(attempt)
+            attempt += 1
+
+
+class _RangesNotSupported(Exception):
+    pass
+
+
+def _fetch_part(
+    url: str, fd: int, start: int, end: int, total: int, transport: Transport
+) -> str | None:
+    """\
+    Fetches the bytes from `start` to `end` inclusive,
+    writing each chunk at its offset in `fd` as it arrives,
+    and returns the validator of the response.
+    """
+
+    received = 0
+    attempt = 0
+    while True:
+        offset = start + received
+        headers = {"Accept-Encoding": "identity", "Range": f"bytes={offset}-{end}"}
+        try:
+            with transport.get(url, headers, stream=True, retries=0) as response:
+                if (
+                    response.status_code in RETRY_STATUS_CODES
+                    and attempt < transport.retries
+                ):
+                    response.close()
+                    transport.wait_to_retry(attempt, response)
+                    attempt += 1
+                    continue
+                if response.status_code != 206:
+                    response.raise_for_status()
+                    raise _RangesNotSupported(url)
+                content_range = parse_content_range(
+                    response.headers.get("Content-Range")
+                )
+                if content_range != (offset, total):
+                    raise _RangesNotSupported(url)
+
+                for chunk in response.iter_content(chunk_size=SEGMENT_CHUNK_SIZE):
+                    os.pwrite(fd, chunk, start + received)
+                    received += len(chunk)
+                validator = response_validator(response)
+        except INTERRUPTED_ERRORS:
+            if attempt >= transport.retries:
+                raise
+            transport.wait_to_retry(attempt)
+            attempt += 1
+            continue
+
+        if received != end + 1 - start:
+            raise DownloadError(
+                f"Downloaded {received} bytes of {url} from {start} to {end}."
+            )
+        return validator
+
+
+def _hash_part(url: str, fd: int, start: int, end: int, download: _Download) -> None:
+    """\
+    Hashes a part that was just written, reading it back from the page cache.
+    """
+
+    offset = start
+    while offset <= end:
+        chunk = os.pread(fd, min(SEGMENT_CHUNK_SIZE, end + 1 - offset), offset)
+        if not chunk:
+            raise DownloadError(f"Could not read back bytes {start}-{end} of {url}.")
+        download.hash(chunk)
+        offset += len(chunk)
+
+
+def _fetch_segmented(
+    url: str,
+    cache_path: Path | None,
+    download: _Download,
+    total: int,
+    segments: int,
+    transport: Transport,
+) -> bool:
+    """\
+    Downloads `total` bytes into a file preallocated at `cache_path`,
+    or an anonymous temporary file if there is none,
+    as parts fetched by `segments` concurrent requests.
+    Every chunk is written straight to its offset in the file,
+    so no part is held in memory,
+    and parts are hashed in order as soon as they are complete,
+    while they are still in the page cache.
+
+    Returns False if the server does not support byte ranges,
+    before anything was hashed.
+    """
+
+    parts = [
+        (start, min(start + PART_SIZE, total) - 1)
+        for start in range(0, total, PART_SIZE)
+    ]
+    with contextlib.ExitStack() as stack:
+        if cache_path is not None:
+            # Not the appending file object, whose writes ignore offsets.
+            fd = os.open(cache_path, os.O_RDWR)
+            stack.callback(os.close, fd)
+        else:
+            fd = stack.enter_context(tempfile.TemporaryFile()).fileno()
+        preallocate(fd, total)
+        executor = stack.enter_context(
+            ThreadPoolExecutor(segments, thread_name_prefix="download")
+        )
+
+        def submit(part: tuple[int, int]) -> Future[str | None]:
+            start, end = part
+            return executor.submit(_fetch_part, url, fd, start, end, total, transport)
+
+        pending = deque((part, submit(part)) for part in parts)
+        validators = set()
+        try:
+            while pending:
+                (start, end), future = pending.popleft()
+                try:
+                    validator = future.result()
+                except _RangesNotSupported:
+                    if download.size:
+                        raise DownloadError(f"{url} stopped supporting byte ranges.")
+                    return False
+                validators.add(validator)
+                if len(validators) > 1:
+                    raise DownloadError(f"{url} changed while it was downloaded.")
+                _hash_part(url, fd, start, end, download)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    download.total = total
+    return True
@@ -28,3 +28,28 @@ class MissingArtifactError(PipFreeze2NixError):
     """
 
     pass
+
+
+class OfflineCacheMissError(PipFreeze2NixError):
+    """\
+    Raised when running offline and a resource is not in the local cache.
+    """
+
+    pass
+
+
+class DownloadError(PipFreeze2NixError):
+    """\
+    Raised when a download is shorter or longer than announced.
+    """
+
+    pass
+
+
+class DependencyCycleError(PipCompileInvariantError):
+    """\
+    Raised when requirements depend on each other in a cycle,
+    which cannot be expressed as nix derivations.
+    """
+
+    pass
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable
+from typing import Sequence
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+from packaging.utils import canonicalize_name
+from packaging.utils import InvalidSdistFilename
+from packaging.utils import InvalidWheelFilename
+from packaging.utils import NormalizedName
+from packaging.utils import parse_sdist_filename
+from packaging.utils import parse_wheel_filename
+from packaging.version import Version
+
+from pipfreeze2nix.pep503 import Artifact
+from pipfreeze2nix.resolution_store import ResolutionStore
+from pipfreeze2nix.timings import Recorder
+
+# Files at least this large are hashed in a worker process.
+# Smaller ones are hashed in the calling thread,
+# where starting or messaging a worker would cost more than the hash.
+PROCESS_POOL_MIN_SIZE = 32 * 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    """\
+    Hashes the file at `path` through a read-only memory map,
+    which avoids copying it through Python buffers chunk by chunk.
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+class FileHasher:
+    """\
+    Hashes local files, remembering each digest by (path, size, mtime)
+    for the rest of the run and, given a `store`, for later runs,
+    so that unchanged files are never hashed again.
+
+    Large files are hashed across a process pool,
+    so that the resolver threads waiting on them keep every core busy.
+    """
+
+    def __init__(
+        self,
+        store: ResolutionStore | None = None,
+        recorder: Recorder | None = None,
+        processes: int | None = None,
+    ):
+        self.store = store
+        self.recorder = recorder or Recorder()
+        self.processes = processes
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._digests: dict[tuple[str, int, int], str] = {}
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def sha256(self, path: Path) -> str:
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None and self.store is not None:
+            digest = self.store.get_file_digest(*key)
+        if digest is not None:
+            self.recorder.count("file_digests.hit")
+            self._digests[key] = digest
+            return digest
+
+        self.recorder.count("file_digests.miss")
+        if stat.st_size >= PROCESS_POOL_MIN_SIZE:
+            digest = self._process_pool().submit(file_sha256, path).result()
+        else:
+            digest = file_sha256(path)
+        self._digests[key] = digest
+        if self.store is not None:
+            self.store.put_file_digest(*key, digest)
+        return digest
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def is_file_url(url: str) -> bool:
+    return url.startswith("file:")
+
+
+def file_url_path(url: str) -> Path:
+    return Path(url2pathname(urlsplit(url).path))
+
+
+def parse_artifact_filename(filename: str) -> tuple[NormalizedName, Version] | None:
+    try:
+        if filename.endswith(".whl"):
+            name, version, _, _ = parse_wheel_filename(filename)
+        elif filename.endswith((".tar.gz", ".zip")):
+            name, version = parse_sdist_filename(filename)
+        else:
+            return None
+    except (InvalidWheelFilename, InvalidSdistFilename):
+        return None
+    return name, version
+
+
+class FindLinks:
+    """\
+    Artifacts found in local directories, like pip's `--find-links`.
+
+    Each directory is listed once, when the FindLinks is created,
+    into a map of normalized name -> version -> artifacts,
+    so looking up a pin costs no filesystem access at all.
+    Artifacts get `file:` URLs and no hashes;
+    `file_sha256` hashes them once one is chosen.
+    """
+
+    def __init__(self, directories: Iterable[Path]):
+        self.directories = [directory.resolve() for directory in directories]
+        self._artifacts: dict[NormalizedName, dict[Version, list[Artifact]]] = {}
+        for directory in self.directories:
+            with os.scandir(directory) as entries:
+                filenames = sorted(entry.name for entry in entries if entry.is_file())
+            for filename in filenames:
+                parsed = parse_artifact_filename(filename)
+                if parsed is None:
+                    continue
+                name, version = parsed
+                self._artifacts.setdefault(name, {}).setdefault(version, []).append(
+                    Artifact(
+                        url=(directory / filename).as_uri(),
+                        name=filename,
+                    )
+                )
+
+    def get_artifacts(self, name: str, version: Version) -> list[Artifact]:
+        return self._artifacts.get(canonicalize_name(name), {}).get(version, [])
+
+
+def parse_url_prefix(value: str) -> tuple[str, str]:
+    """\
+    Parses a `FROM=TO` prefix mapping,
+    where FROM is either a URL prefix or a local directory.
+    """
+
+    from_prefix, sep, to_prefix = value.partition("=")
+    if not sep or not from_prefix or not to_prefix:
+        raise ValueError(f"Expected FROM=TO, got `{value}`.")
+    if "://" not in from_prefix:
+        from_prefix = Path(from_prefix).resolve().as_uri()
+    return from_prefix.rstrip("/") + "/", to_prefix.rstrip("/") + "/"
+
+
+def map_url(url: str, url_prefixes: Sequence[tuple[str, str]]) -> str:
+    for from_prefix, to_prefix in url_prefixes:
+        if url.startswith(from_prefix):
+            return to_prefix + url[len(from_prefix) :]
+    return url
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import re
+from typing import Mapping
+
+# Digests that Nix can verify, from strongest to weakest.
+# Weaker digests an index publishes, like md5, are ignored.
+SUPPORTED_ALGORITHMS = ("sha512", "sha384", "sha256")
+
+HEX_SHA256_RE = re.compile(r"[0-9a-fA-F]{64}")
+
+
+def parse_hash_fragment(fragment: str) -> dict[str, str]:
+    """\
+    Parses the `<algorithm>=<hex digest>` fragment of a simple index link.
+    """
+
+    algorithm, sep, digest = fragment.partition("=")
+    if not sep or not digest:
+        return {}
+    return {algorithm.strip().lower(): digest.strip()}
+
+
+def to_sri(algorithm: str, hexdigest: str) -> str:
+    """\
+    Formats a hex digest as a Subresource Integrity hash, like Nix's `hash` attribute.
+    """
+
+    return f"{algorithm}-{base64.b64encode(bytes.fromhex(hexdigest)).decode()}"
+
+
+def best_sri(hashes: Mapping[str, str]) -> str | None:
+    """\
+    Returns the strongest valid digest in `hashes` as an SRI hash,
+    or None if there is no digest Nix can verify.
+    A digest that isn't hex, or has the wrong length for its algorithm,
+    could never match and is skipped.
+    """
+
+    for algorithm in SUPPORTED_ALGORITHMS:
+        hexdigest = hashes.get(algorithm)
+        if hexdigest is None:
+            continue
+        try:
+            digest = bytes.fromhex(hexdigest)
+        except ValueError:
+            continue
+        if len(digest) != hashlib.new(algorithm).digest_size:
+            continue
+        return to_sri(algorithm, hexdigest)
+    return None
+
+
+def normalize_hash(value: str) -> str:
+    """\
+    Converts a hex sha256, as written by older versions of pipfreeze2nix,
+    into an SRI hash. SRI hashes are returned unchanged.
+    """
+
+    if HEX_SHA256_RE.fullmatch(value):
+        return to_sri("sha256", value)
+    return value
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import replace
+from pathlib import Path
+from typing import BinaryIO
+from typing import Iterator
+from typing import Optional
+
+from packaging.utils import canonicalize_name
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    content_type: Optional[str] = None
+    # The index answered 404: it does not have this project.
+    not_found: bool = False
+    # The charset of an HTML body; PEP 691 JSON is always UTF-8.
+    encoding: Optional[str] = None
+    # The name of the file holding the body, new for every body written.
+    body: Optional[str] = None
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.fetched_at < ttl
+
+    def revalidation_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def refreshed(self) -> CachedPage:
+        return replace(self, fetched_at=time.time())
+
+
+class IndexCache:
+    """\
+    An on-disk cache of simple index pages,
+    keyed by index URL and normalized project name.
+
+    Every page is stored as two files: a small JSON file of its CachedPage,
+    and its body, gzip-compressed, as the index sent it.
+    Bodies are written while they are downloaded and read while they are parsed,
+    so a page as a whole is never held in memory,
+    and revalidating a page only rewrites its CachedPage.
+    Every body is written to a new file that its CachedPage names,
+    so replacing the CachedPage is the only step that changes a page:
+    a reader never sees a body with the ETag of another one.
+    A CachedPage's mtime is bumped every time it is read,
+    so that eviction can remove the least recently used pages
+    once the cache grows beyond `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: float,
+        max_size: int,
+        offline: bool = False,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Pages written before bodies had names of their own.
+        for path in self.directory.glob("*.gz"):
+            if "-" not in path.name:
+                path.unlink(missing_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _entries(self) -> list[tuple[float, int, list[Path]]]:
+        """\
+        Lists the (mtime, size of all files, files) of every cached page.
+        Bodies left behind by an interrupted write are listed with their page,
+        or on their own, so that eviction removes them too.
+        """
+
+        files_by_key: dict[str, list[Path]] = {}
+        for path in self.directory.iterdir():
+            if path.suffix not in (".json", ".gz"):
+                continue
+            key = path.name.partition(".")[0].partition("-")[0]
+            files_by_key.setdefault(key, []).append(path)
+
+        entries = []
+        for key, paths in files_by_key.items():
+            mtime = None
+            size = 0
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                if path.suffix == ".json" or mtime is None:
+                    mtime = stat.st_mtime
+            if mtime is not None:
+                entries.append((mtime, size, paths))
+        return entries
+
+    def _key(self, index_url: str, project: str) -> str:
+        key = f"{index_url}\0{canonicalize_name(project)}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _read(self, path: Path) -> CachedPage | None:
+        try:
+            return CachedPage(**json.loads(path.read_bytes()))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def get(self, index_url: str, project: str) -> CachedPage | None:
+        path = self.directory / f"{self._key(index_url, project)}.json"
+        page = self._read(path)
+        if page is not None:
+            with contextlib.suppress(OSError):
+                os.utime(path)
+        return page
+
+    def open_body(self, page: CachedPage) -> BinaryIO | None:
+        """\
+        Opens the decompressed body of a cached page,
+        or returns None if it is not cached (anymore).
+        """
+
+        if page.body is None:
+            return None
+        try:
+            return gzip.open(self.directory / page.body, "rb")
+        except FileNotFoundError:
+            return None
+
+    @contextlib.contextmanager
+    def writer(
+        self, index_url: str, project: str, page: CachedPage
+    ) -> Iterator[BinaryIO]:
+        """\
+        Yields a file to write the body of `page` to.
+        The page is only cached once the block completes,
+        and is discarded if it raises.
+        """
+
+        fd, body_name = tempfile.mkstemp(
+            dir=self.directory,
+            prefix=f"{self._key(index_url, project)}-",
+            suffix=".gz",
+        )
+        body_path = self.directory / body_name
+        try:
+            with os.fdopen(fd, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb") as body:
+                yield body
+        except BaseException:
+            body_path.unlink()
+            raise
+        with self._lock:
+            self._size += body_path.stat().st_size
+        self.refresh(index_url, project, replace(page, body=body_path.name))
+
+    def put(
+        self, index_url: str, project: str, page: CachedPage, body: bytes = b""
+    ) -> None:
+        with self.writer(index_url, project, page) as f:
+            f.write(body)
+
+    def refresh(self, index_url: str, project: str, page: CachedPage) -> None:
+        """\
+        Replaces the CachedPage of a page,
+        e.g. after the index confirmed it is still current.
+        This is the single step that commits a page:
+        the body the page replaced is only removed afterwards.
+        """
+
+        path = self.directory / f"{self._key(index_url, project)}.json"
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(page.__dict__, f)
+        size = os.stat(tmp_name).st_size
+
+        with self._lock:
+            old_page = self._read(path)
+            try:
+                old_size = path.stat().st_size
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_name, path)
+            self._size += size - old_size
+
+            if old_page is not None and old_page.body not in (None, page.body):
+                old_body_path = self.directory / old_page.body
+                with contextlib.suppress(FileNotFoundError):
+                    self._size -= old_body_path.stat().st_size
+                    old_body_path.unlink()
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[:2])
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, paths in entries:
+            if self._size <= self.max_size:
+                break
+            for path in paths:
+                path.unlink(missing_ok=True)
+            self._size -= size
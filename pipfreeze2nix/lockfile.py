@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from typing import Mapping
+
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion
+from packaging.version import Version
+
+from pipfreeze2nix.hashes import normalize_hash
+
+# Matches a single package as rendered by `generate_build_python_package`,
+# including the `builtins.fetchurl` with a hex sha256
+# written by versions before SRI hashes.
+PACKAGE_RE = re.compile(
+    r"""
+    pname\ =\ "(?P<name>[^"]+)";\s*
+    version\ =\ "(?P<version>[^"]+)";\s*
+    format\ =\ "(?P<format>[^"]+)";
+    .*?
+    src\ =\ (?:nixpkgs|builtins)\.fetchurl\ \{\s*
+      url\ =\ "(?P<url>[^"]+)";\s*
+      (?:hash|sha256)\ =\ "(?P<hash>[^"]+)";
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Starts the first line of a requirements.nix,
+# followed by the JSON context it was locked in.
+CONTEXT_PREFIX = "# pipfreeze2nix context: "
+
+
+@dataclass(frozen=True)
+class LockedArtifact:
+    url: str
+    # An SRI hash, e.g. "sha256-<base64 digest>".
+    hash: str
+    artifact_format: str
+
+
+def lock_key(name: str, version: Version) -> tuple[str, str]:
+    return (canonicalize_name(name), str(version))
+
+
+def render_context(context: Mapping[str, Any]) -> str:
+    return f"{CONTEXT_PREFIX}{json.dumps(context, sort_keys=True)}\n"
+
+
+def read_context(contents: str) -> Any:
+    first_line, _, _ = contents.partition("\n")
+    if not first_line.startswith(CONTEXT_PREFIX):
+        return None
+    try:
+        return json.loads(first_line[len(CONTEXT_PREFIX) :])
+    except ValueError:
+        return None
+
+
+def read_locked_artifacts(
+    nix_file: Path, context: Mapping[str, Any]
+) -> dict[tuple[str, str], LockedArtifact]:
+    """\
+    Reads the artifacts chosen for each package in a previously generated
+    requirements.nix, keyed by normalized name and version.
+    Returns an empty mapping if the file does not exist,
+    or if it was not locked in `context`.
+    """
+
+    try:
+        contents = nix_file.read_text()
+    except FileNotFoundError:
+        return {}
+    if read_context(contents) != context:
+        return {}
+
+    locked_artifacts = {}
+    for match in PACKAGE_RE.finditer(contents):
+        try:
+            version = Version(match["version"])
+        except InvalidVersion:
+            continue
+
+        locked_artifacts[lock_key(match["name"], version)] = LockedArtifact(
+            url=match["url"],
+            hash=normalize_hash(match["hash"]),
+            artifact_format=match["format"],
+        )
+    return locked_artifacts
+
+
+def read_json_locked_artifacts(
+    lock_file: Path, context: Mapping[str, Any]
+) -> dict[tuple[str, str], LockedArtifact]:
+    """\
+    Reads the artifacts chosen for each package in a previously generated
+    JSON lock, like `read_locked_artifacts`.
+    Packages locked separately for each system are skipped.
+    Returns an empty mapping if the file does not exist, is not a lock,
+    or was not locked in `context`.
+    """
+
+    try:
+        lock = json.loads(lock_file.read_text())
+        packages = lock["packages"]
+        if lock.get("context") != context:
+            return {}
+    except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+    locked_artifacts = {}
+    for package in packages:
+        if "url" not in package:
+            continue
+        try:
+            version = Version(package["version"])
+        except InvalidVersion:
+            continue
+
+        locked_artifacts[lock_key(package["name"], version)] = LockedArtifact(
+            url=package["url"],
+            hash=normalize_hash(package["hash"]),
+            artifact_format=package["format"],
+        )
+    return locked_artifacts
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+
+from packaging.utils import canonicalize_name
+from packaging.utils import NormalizedName
+from packaging.version import InvalidVersion
+from packaging.version import Version
+
+NIX_IDENTIFIER_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_'-]*")
+
+
+def nix_attr(name: str) -> str:
+    """\
+    Formats `name` for use in a Nix attribute path, quoting it if needed.
+    """
+
+    if NIX_IDENTIFIER_RE.fullmatch(name):
+        return name
+    return json.dumps(name)
+
+
+class NixpkgsIndex:
+    """\
+    The versions of the packages in a nixpkgs python package set,
+    read from a JSON object of attribute name -> version exported beforehand
+    with `nix eval` (see the README), so looking them up needs neither nix
+    nor the network. Versions that are null or not PEP 440 are ignored.
+
+    Attribute names are matched by their PEP 503 normalized form.
+    When several attributes normalize to the same name,
+    the one that already is the normalized name wins.
+    """
+
+    def __init__(self, versions: dict[str, str | None]):
+        self._packages: dict[NormalizedName, tuple[str, Version]] = {}
+        for attr, version in sorted(versions.items()):
+            if not isinstance(version, str):
+                continue
+            try:
+                parsed_version = Version(version)
+            except InvalidVersion:
+                continue
+            name = canonicalize_name(attr)
+            if name not in self._packages or attr == name:
+                self._packages[name] = (attr, parsed_version)
+
+    @classmethod
+    def load(cls, path: Path) -> NixpkgsIndex:
+        versions = json.loads(path.read_text())
+        if not isinstance(versions, dict):
+            raise ValueError(f"{path} is not a JSON object of versions.")
+        return cls(versions)
+
+    def get(self, name: str, version: Version) -> str | None:
+        """\
+        Returns the attribute of the package that provides exactly
+        `version` of `name`, or None.
+        """
+
+        package = self._packages.get(canonicalize_name(name))
+        if package is None:
+            return None
+        attr, package_version = package
+        if package_version != version:
+            return None
+        return attr
+
+    def __len__(self) -> int:
+        return len(self._packages)
@@ -1,102 +1,449 @@
 from __future__ import annotations
 
+import codecs
+import contextlib
+import functools
+import json
 import os
+import posixpath
+import time
 from dataclasses import dataclass
+from dataclasses import field
 from html.parser import HTMLParser
-from pathlib import Path
+from typing import BinaryIO
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
 from typing import Optional
 from urllib.parse import urlsplit
 from urllib.parse import urlunsplit
 
-import requests
+from packaging.version import InvalidVersion
+from packaging.version import Version
 
+from pipfreeze2nix.exceptions import OfflineCacheMissError
 from pipfreeze2nix.exceptions import Pep503Error
+from pipfreeze2nix.hashes import parse_hash_fragment
+from pipfreeze2nix.index_cache import CachedPage
+from pipfreeze2nix.index_cache import IndexCache
+from pipfreeze2nix.timings import Recorder
+from pipfreeze2nix.transport import default_transport
+from pipfreeze2nix.transport import Transport
 
 
-@dataclass(frozen=True)
+# Slotted, since a page can list tens of thousands of artifacts.
+@dataclass(frozen=True, slots=True)
 class Artifact:
     url: str
     name: str
-    sha256: Optional[str]
+    # Hex digests published by the index, keyed by lowercase algorithm name.
+    hashes: Mapping[str, str] = field(default_factory=dict, hash=False)
+    size: Optional[int] = None
 
     @property
     def is_wheel(self) -> bool:
         return self.name.endswith(".whl")
 
 
+class UrlResolver:
+    """\
+    Resolves the URLs of a page against the page's URL,
+    which is only split once per page.
+    Paths are normalized as strings, like a browser would,
+    so resolving a URL never touches the filesystem.
+    """
+
+    __slots__ = ("scheme", "netloc", "directory")
+
+    def __init__(self, base_url: str):
+        self.scheme, self.netloc, self.directory, _, _ = urlsplit(base_url)
+
+    def resolve(self, url: str) -> str:
+        _, netloc, path, query, fragment = urlsplit(url)
+        if netloc:
+            return url
+
+        if not path.startswith("/"):
+            path = posixpath.join(self.directory, path)
+        return urlunsplit(
+            (self.scheme, self.netloc, posixpath.normpath(path), query, fragment)
+        )
+
+
 def make_url_absolute(package_url: str, url: str) -> str:
-    _, netloc, path, query, fragment = urlsplit(url)
-    if netloc:
+    return UrlResolver(package_url).resolve(url)
+
+
+def redact_url(url: str) -> str:
+    """\
+    Removes the `user:password@` an index URL may carry,
+    so that it can be written to files that are shared.
+    """
+
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    _, sep, host = netloc.rpartition("@")
+    if not sep:
         return url
+    return urlunsplit((scheme, host, path, query, fragment))
 
-    package_scheme, package_netloc, package_path, _, _ = urlsplit(package_url)
-    package_path = Path(package_path)
 
-    path = Path(path)
-    if path.is_absolute():
-        result_path = path
-    else:
-        result_path = package_path / path
-    result_path = result_path.resolve()
+SDIST_EXTENSIONS = (".tar.gz", ".zip")
 
-    return urlunsplit(
-        (package_scheme, package_netloc, str(result_path), query, fragment)
-    )
+
+class VersionFilter:
+    """\
+    Matches artifact filenames against a pinned version
+    by comparing only the version segment of the filename,
+    without parsing the rest of it.
+    Comparisons are memoized by version string,
+    since most releases publish many artifacts.
+    """
+
+    __slots__ = ("version", "_seen")
+
+    def __init__(self, version: Version):
+        self.version = version
+        self._seen: dict[str, bool] = {}
+
+    def __call__(self, filename: str) -> bool:
+        if filename.endswith(".whl"):
+            parts = filename.split("-")
+            if len(parts) < 5:
+                return False
+            version = parts[1]
+        else:
+            for extension in SDIST_EXTENSIONS:
+                if filename.endswith(extension):
+                    break
+            else:
+                return False
+            _, sep, version = filename[: -len(extension)].rpartition("-")
+            if not sep:
+                return False
+
+        matches = self._seen.get(version)
+        if matches is None:
+            try:
+                matches = Version(version) == self.version
+            except InvalidVersion:
+                matches = False
+            self._seen[version] = matches
+        return matches
 
 
 class SimpleParser(HTMLParser):
-    def __init__(self, package_url: str):
-        self.package_url = package_url
+    """\
+    Parses a PEP 503 project page, which can be fed in chunks.
+    Given a `version_filter`, only anchors for matching filenames
+    become Artifacts.
+    """
+
+    def __init__(self, package_url: str, version_filter: VersionFilter | None = None):
         super().__init__()
-        self.artifacts = []
-        self.last_tag = (
-            (""),
-            (""),
+        self.resolver = UrlResolver(package_url)
+        self.version_filter = version_filter
+        self.artifacts: list[Artifact] = []
+        # The href and text so far of the anchor being parsed.
+        # Text can arrive in several pieces when the page is fed in chunks.
+        self._href: str | None = None
+        self._text: list[str] = []
+
+    def _end_anchor(self) -> None:
+        href = self._href
+        if href is None:
+            return
+        self._href = None
+        name = "".join(self._text)
+        self._text.clear()
+
+        if not name:
+            return
+        if self.version_filter is not None and not self.version_filter(name):
+            return
+        url, _, fragment = href.partition("#")
+        self.artifacts.append(
+            Artifact(
+                url=self.resolver.resolve(url),
+                name=name,
+                hashes=parse_hash_fragment(fragment),
+            ),
         )
 
     def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
-        self.last_tag = (tag, dict(attrs))
+        self._end_anchor()
+        if tag != "a":
+            return
+        for attr, value in attrs:
+            if attr == "href":
+                if value is None:
+                    raise Pep503Error(
+                        "Every anchor must have an associated `href` attribute."
+                    )
+                self._href = value
+                return
+
+    def handle_endtag(self, tag: str) -> None:
+        self._end_anchor()
 
     def handle_data(self, data: str) -> None:
-        last_tag, last_attrs = self.last_tag
-        if not last_tag or not last_attrs:
-            return
+        if self._href is not None:
+            self._text.append(data)
 
-        if last_tag != "a":
-            return
+    def close(self) -> None:
+        super().close()
+        self._end_anchor()
 
-        url = last_attrs["href"]
-        if url is None:
-            raise Pep503Error("Every anchor must have an associated `href` attribute.")
 
-        url, _, sha256 = url.partition("#")
-        if sha256:
-            _, _, sha256 = sha256.partition("=")
-        else:
-            sha256 = None
+def parse_json_page(
+    package_url: str, body: str | bytes, version_filter: VersionFilter | None = None
+) -> list[Artifact]:
+    """\
+    Parses a project page from the PEP 691 JSON simple API:
+    https://peps.python.org/pep-0691/
+    """
 
-        self.artifacts.append(
-            Artifact(
-                url=make_url_absolute(self.package_url, url),
-                name=data,
-                sha256=sha256,
-            ),
+    try:
+        page = json.loads(body)
+        api_version = page["meta"]["api-version"]
+        files = page["files"]
+    except (ValueError, KeyError, TypeError):
+        raise Pep503Error(f"Malformed PEP 691 project page at {package_url}.")
+
+    major_version, _, _ = api_version.partition(".")
+    if major_version != "1":
+        raise Pep503Error(
+            f"Unsupported PEP 691 API version {api_version} at {package_url}."
+        )
+
+    resolver = UrlResolver(package_url)
+    return [
+        Artifact(
+            url=resolver.resolve(file["url"]),
+            name=file["filename"],
+            hashes={
+                algorithm.lower(): digest
+                for algorithm, digest in file["hashes"].items()
+            },
+            size=file.get("size"),
         )
+        for file in files
+        if version_filter is None or version_filter(file["filename"])
+    ]
+
+
+def normalize_index_url(index_url: str) -> str:
+    if not index_url.endswith("/"):
+        index_url = f"{index_url}/"
+    return index_url
 
 
 def get_index_url() -> str:
     if pip_index := os.environ.get("PIP_INDEX_URL"):
-        if not pip_index.endswith("/"):
-            pip_index = f"{pip_index}/"
-        return pip_index
+        return normalize_index_url(pip_index)
     return "https://pypi.org/simple/"
 
 
-def get_artifacts(package: str) -> list[Artifact]:
-    package_url = f"{get_index_url()}{package}/"
-    res = requests.get(package_url)
-    res.raise_for_status()
+def get_extra_index_urls() -> list[str]:
+    return [
+        normalize_index_url(index_url)
+        for index_url in os.environ.get("PIP_EXTRA_INDEX_URL", "").split()
+    ]
+
+
+PEP691_CONTENT_TYPE = "application/vnd.pypi.simple.v1+json"
+
+ACCEPT_HEADER = ", ".join(
+    (
+        PEP691_CONTENT_TYPE,
+        "application/vnd.pypi.simple.v1+html;q=0.2",
+        "text/html;q=0.01",
+    )
+)
+
+
+def not_found_page() -> CachedPage:
+    return CachedPage(
+        etag=None,
+        last_modified=None,
+        fetched_at=time.time(),
+        not_found=True,
+    )
+
 
-    parser = SimpleParser(package_url)
-    parser.feed(res.text)
+def is_json_page(content_type: str | None) -> bool:
+    content_type, _, _ = (content_type or "").partition(";")
+    return content_type.strip() == PEP691_CONTENT_TYPE
+
+
+def parse_page(
+    package_url: str,
+    page: CachedPage,
+    chunks: Iterable[bytes],
+    version_filter: VersionFilter | None = None,
+) -> list[Artifact]:
+    """\
+    Parses the body of `page` from `chunks`.
+    HTML is fed to the parser chunk by chunk,
+    so the body as a whole is never held in memory.
+    JSON has to be read whole; it is decoded straight from bytes,
+    since PEP 691 requires UTF-8.
+    """
+
+    if is_json_page(page.content_type):
+        return parse_json_page(package_url, b"".join(chunks), version_filter)
+
+    decoder = codecs.getincrementaldecoder(page.encoding or "utf-8")("replace")
+    parser = SimpleParser(package_url, version_filter)
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
     return parser.artifacts
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def read_chunks(f: BinaryIO) -> Iterator[bytes]:
+    return iter(functools.partial(f.read, STREAM_CHUNK_SIZE), b"")
+
+
+def tee(chunks: Iterable[bytes], out: BinaryIO) -> Iterator[bytes]:
+    for chunk in chunks:
+        out.write(chunk)
+        yield chunk
+
+
+def parse_cached_page(
+    package: str,
+    package_url: str,
+    page: CachedPage,
+    body: BinaryIO | None,
+    version_filter: VersionFilter | None,
+    recorder: Recorder,
+) -> list[Artifact] | None:
+    if page.not_found or body is None:
+        return None
+    with recorder.span("parse_page", name=package):
+        return parse_page(package_url, page, read_chunks(body), version_filter)
+
+
+def find_artifacts(
+    package: str,
+    index_cache: IndexCache | None = None,
+    transport: Transport | None = None,
+    recorder: Recorder | None = None,
+    index_url: str | None = None,
+    version: Version | None = None,
+) -> list[Artifact] | None:
+    """\
+    Lists the artifacts of `package` on `index_url`,
+    which defaults to `get_index_url()`.
+    Given a `version`, only the artifacts of that version are listed,
+    and those of other versions are never materialized.
+    Returns None if the index does not have the package,
+    which an empty list for a missing version can't tell apart.
+
+    Whether it comes from the network or from `index_cache`,
+    the page is parsed while it is read, and a page from the network
+    is written to `index_cache` at the same time.
+    """
+
+    recorder = recorder or Recorder()
+    transport = transport or default_transport()
+    index_url = index_url or get_index_url()
+    package_url = f"{index_url}{package}/"
+    version_filter = None if version is None else VersionFilter(version)
+    headers = {"Accept": ACCEPT_HEADER}
+
+    with contextlib.ExitStack() as stack:
+        cached_page = None
+        cached_body = None
+        if index_cache is not None:
+            cached_page = index_cache.get(index_url, package)
+            if cached_page is not None and not cached_page.not_found:
+                cached_body = index_cache.open_body(cached_page)
+                if cached_body is None:
+                    # Evicted or replaced since its CachedPage was read.
+                    cached_page = None
+                else:
+                    stack.enter_context(cached_body)
+
+            if cached_page is not None and (
+                index_cache.offline or cached_page.is_fresh(index_cache.ttl)
+            ):
+                recorder.count("index_cache.hit")
+                return parse_cached_page(
+                    package,
+                    package_url,
+                    cached_page,
+                    cached_body,
+                    version_filter,
+                    recorder,
+                )
+
+            if index_cache.offline:
+                raise OfflineCacheMissError(
+                    f"Index page for `{package}` from {index_url} is not cached."
+                )
+            if cached_page is not None:
+                headers.update(cached_page.revalidation_headers())
+
+        res = transport.get(package_url, headers=headers, stream=True)
+        stack.callback(res.close)
+        if index_cache is not None and cached_page is not None:
+            if res.status_code == 304:
+                recorder.count("index_cache.revalidated")
+                cached_page = cached_page.refreshed()
+                index_cache.refresh(index_url, package, cached_page)
+                return parse_cached_page(
+                    package,
+                    package_url,
+                    cached_page,
+                    cached_body,
+                    version_filter,
+                    recorder,
+                )
+        if index_cache is not None:
+            recorder.count("index_cache.miss")
+
+        if res.status_code == 404:
+            # Remember that the project is not on this index,
+            # so that it is not asked again until the entry goes stale.
+            if index_cache is not None:
+                index_cache.put(index_url, package, not_found_page())
+            return None
+        res.raise_for_status()
+
+        page = CachedPage(
+            etag=res.headers.get("ETag"),
+            last_modified=res.headers.get("Last-Modified"),
+            fetched_at=time.time(),
+            content_type=res.headers.get("Content-Type"),
+            encoding=res.encoding,
+        )
+        chunks = res.iter_content(STREAM_CHUNK_SIZE)
+        with recorder.span("stream_page", name=package):
+            if index_cache is None:
+                return parse_page(package_url, page, chunks, version_filter)
+            with index_cache.writer(index_url, package, page) as body:
+                return parse_page(package_url, page, tee(chunks, body), version_filter)
+
+
+def get_artifacts(
+    package: str,
+    index_cache: IndexCache | None = None,
+    transport: Transport | None = None,
+    recorder: Recorder | None = None,
+    index_url: str | None = None,
+    version: Version | None = None,
+) -> list[Artifact]:
+    """\
+    Like `find_artifacts`, but returns an empty list
+    if the index does not have the package.
+    """
+
+    artifacts = find_artifacts(
+        package, index_cache, transport, recorder, index_url, version
+    )
+    return artifacts or []
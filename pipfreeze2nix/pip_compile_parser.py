@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-import bisect
+import dataclasses
+import heapq
 from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
@@ -9,6 +10,7 @@ from typing import Iterable
 from packaging.requirements import InvalidRequirement
 from packaging.requirements import Requirement
 
+from pipfreeze2nix.exceptions import DependencyCycleError
 from pipfreeze2nix.exceptions import PipCompileInvariantError
 
 
@@ -19,6 +21,12 @@ class RequirementTree:
     dependencies: frozenset[str]
 
 
+@dataclass(frozen=True)
+class IndexOptions:
+    index_url: str | None = None
+    extra_index_urls: tuple[str, ...] = ()
+
+
 @dataclass(frozen=True)
 class _InverseRequirementTree:
     req: Requirement
@@ -26,21 +34,42 @@ class _InverseRequirementTree:
     depended_on_by: set[str]
 
 
+def _split_line(i: int, line: str) -> tuple[str, str]:
+    contents, _, comment = line.partition("#")
+    contents, comment = (contents.strip(), comment.strip())
+    if contents and comment:
+        raise PipCompileInvariantError(
+            f"Comment and non-comment contents on the same line ({i}): {line}",
+        )
+    return contents, comment
+
+
+def _parse_requirement_line(contents: str) -> Requirement | None:
+    """\
+    Parses the requirement on a non-comment line,
+    or returns None for option lines like `--index-url` or `--hash`,
+    which pip-compile always starts with a dash.
+    """
+
+    if contents.startswith("-"):
+        return None
+
+    # pip-compile --generate-hashes continues requirements onto `--hash` lines.
+    contents = contents.removesuffix("\\").rstrip()
+    try:
+        return Requirement(contents)
+    except InvalidRequirement:
+        return None
+
+
 def segment_compiled_requirements(lines: list[str]) -> list[list[str]]:
     segments = []
     current_segment = []
     for i, line in enumerate(lines):
-        contents, _, comment = line.partition("#")
-        contents, comment = (contents.strip(), comment.strip())
-        if contents and comment:
-            raise PipCompileInvariantError(
-                f"Comment and non-comment contents on the same line ({i}): {line}",
-            )
+        contents, comment = _split_line(i, line)
 
         if contents:
-            try:
-                Requirement(contents)
-            except InvalidRequirement:
+            if _parse_requirement_line(contents) is None:
                 continue
 
             if current_segment:
@@ -57,43 +86,71 @@ def segment_compiled_requirements(lines: list[str]) -> list[list[str]]:
     return segments
 
 
-def parse_segment(segment: list[str]) -> _InverseRequirementTree:
-    if not len(segment) >= 2:
+def _make_inverse_tree(
+    req: Requirement, annotations: list[str]
+) -> _InverseRequirementTree:
+    if not annotations:
         raise PipCompileInvariantError(
             "Each segment (requirement and `via` comments) "
             "must be at least 2 elements long, "
-            f"not {len(segment)}: {segment}",
+            f"not 1: {[str(req)]}",
         )
 
-    req = Requirement(segment[0])
-    depended_on_by = segment[1:]
-    if depended_on_by[0] == "via":
-        depended_on_by = depended_on_by[1:]
-    for i, name in enumerate(depended_on_by):
-        if name.startswith("via "):
-            depended_on_by[i] = name[len("via ") :]
-
-    to_remove = []
+    depended_on_by = set()
     is_direct = False
-    for i, name in enumerate(depended_on_by):
+    for i, name in enumerate(annotations):
+        if i == 0 and name == "via":
+            continue
+        name = name.removeprefix("via ")
         if name.startswith("-r "):
             is_direct = True
-            to_remove.append(i)
-
-    for i in reversed(to_remove):
-        depended_on_by.pop(i)
+            continue
+        depended_on_by.add(name)
 
     return _InverseRequirementTree(
         req=req,
         is_direct=is_direct,
-        depended_on_by=set(depended_on_by),
+        depended_on_by=depended_on_by,
     )
 
 
-def parse_compiled_requirements(requirements_txt: Path) -> list[RequirementTree]:
-    lines = requirements_txt.read_text().splitlines()
-    segments = segment_compiled_requirements(lines)
-    inverse_trees = [parse_segment(segment) for segment in segments]
+def parse_segment(segment: list[str]) -> _InverseRequirementTree:
+    if not len(segment) >= 2:
+        raise PipCompileInvariantError(
+            "Each segment (requirement and `via` comments) "
+            "must be at least 2 elements long, "
+            f"not {len(segment)}: {segment}",
+        )
+
+    return _make_inverse_tree(Requirement(segment[0]), segment[1:])
+
+
+def parse_compiled_lines(lines: Iterable[str]) -> list[RequirementTree]:
+    """\
+    Parses pip-compile output in a single pass over `lines`,
+    parsing each requirement exactly once.
+    """
+
+    inverse_trees = []
+    current_req = None
+    annotations: list[str] = []
+    for i, line in enumerate(lines):
+        contents, comment = _split_line(i, line)
+
+        if contents:
+            req = _parse_requirement_line(contents)
+            if req is None:
+                continue
+
+            if current_req is not None:
+                inverse_trees.append(_make_inverse_tree(current_req, annotations))
+            current_req = req
+            annotations = []
+        elif comment and current_req is not None:
+            annotations.append(comment)
+
+    if current_req is not None:
+        inverse_trees.append(_make_inverse_tree(current_req, annotations))
 
     dependencies: dict[str, set[str]] = defaultdict(set)
     for inverse_tree in inverse_trees:
@@ -110,59 +167,183 @@ def parse_compiled_requirements(requirements_txt: Path) -> list[RequirementTree]
     ]
 
 
-class _RequirementTreeGraph:
-    def __init__(self, requirement_trees: Iterable[RequirementTree]):
-        self.table = {}
-        self.graph = defaultdict(set)
-        self.inverse_graph = defaultdict(set)
-        for requirement_tree in requirement_trees:
-            self.table[requirement_tree.req.name] = requirement_tree
-            self.graph[requirement_tree.req.name] = set(requirement_tree.dependencies)
+def parse_compiled_requirements(requirements_txt: Path) -> list[RequirementTree]:
+    with open(requirements_txt) as f:
+        return parse_compiled_lines(line.rstrip("\n") for line in f)
+
+
+def parse_index_options(lines: Iterable[str]) -> IndexOptions:
+    """\
+    Collects the `--index-url` (or `-i`) and `--extra-index-url` options
+    that pip-compile writes with `--emit-index-url`,
+    in either the `--option value` or the `--option=value` form.
+    """
 
-            if requirement_tree.req.name not in self.inverse_graph:
-                self.inverse_graph[requirement_tree.req.name] = set()
+    index_url = None
+    extra_index_urls: list[str] = []
+    for line in lines:
+        contents = line.strip()
+        if not contents.startswith("-"):
+            continue
 
-            for dependency in requirement_tree.dependencies:
-                self.inverse_graph[dependency].add(requirement_tree.req.name)
+        option, *rest = contents.split(None, 1)
+        if "=" in option:
+            option, value = option.split("=", 1)
+        elif rest:
+            value = rest[0]
+        else:
+            continue
 
-        self.no_incoming_nodes = []
-        for node, parents in self.inverse_graph.items():
-            if not parents:
-                bisect.insort(self.no_incoming_nodes, node)
+        if option in ("-i", "--index-url"):
+            index_url = value
+        elif option == "--extra-index-url":
+            extra_index_urls.append(value)
 
-    def get_requirement_tree(self, name: str) -> RequirementTree:
-        return self.table[name]
+    return IndexOptions(index_url=index_url, extra_index_urls=tuple(extra_index_urls))
 
-    def next_node(self) -> str | None:
-        if not self.no_incoming_nodes:
-            return None
-        node = self.no_incoming_nodes.pop()
 
-        dependencies = self.graph[node]
-        for dependency in dependencies:
-            self.inverse_graph[dependency].remove(node)
-            if not self.inverse_graph[dependency]:
-                bisect.insort(self.no_incoming_nodes, dependency)
+def read_index_options(requirements_txt: Path) -> IndexOptions:
+    with open(requirements_txt) as f:
+        return parse_index_options(f)
 
-        del self.graph[node]
-        del self.inverse_graph[node]
 
-        return node
+def _strongly_connected_components(graph: dict[str, set[str]]) -> list[list[str]]:
+    """\
+    Tarjan's algorithm, written iteratively so that deep graphs
+    don't run into the recursion limit.
+    Components are returned in reverse topological order of the condensed graph.
+    """
+
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[str] = []
+    components = []
+
+    for root in graph:
+        if root in index:
+            continue
+
+        work = [(root, iter(graph[root]))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(graph[successor])))
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent, _ = work[-1]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
 
 
 def sorted_reverse_topological(
     requirement_trees: Iterable[RequirementTree],
+    break_cycles: bool = False,
 ) -> list[RequirementTree]:
     """\
     Returns the provided RequirementTrees sorted by:
 
     - PRIMARY: Reverse topological order.
     - SECONDARY: Lexicographic order.
+
+    Requirements that depend on each other in a cycle raise a DependencyCycleError,
+    unless `break_cycles` is set.
+    Then every cycle is emitted as a block, in lexicographic order,
+    at the position of its lexicographically smallest member,
+    and the dependencies between members of the cycle are dropped.
     """
 
+    table = {}
+    graph: dict[str, set[str]] = {}
+    for requirement_tree in requirement_trees:
+        table[requirement_tree.req.name] = requirement_tree
+    for requirement_tree in table.values():
+        graph[requirement_tree.req.name] = {
+            dependency
+            for dependency in requirement_tree.dependencies
+            if dependency in table
+        }
+
+    components = _strongly_connected_components(graph)
+    cycles = [
+        sorted(component)
+        for component in components
+        if len(component) > 1 or component[0] in graph[component[0]]
+    ]
+    if cycles and not break_cycles:
+        raise DependencyCycleError(
+            "Requirements depend on each other in a cycle: "
+            + "; ".join(" <-> ".join(cycle) for cycle in cycles)
+        )
+
+    component_of = {}
+    for i, component in enumerate(components):
+        component.sort()
+        for member in component:
+            component_of[member] = i
+
+    # Kahn's algorithm over the condensed graph,
+    # always taking the lexicographically largest component that nothing depends on.
+    # Reversing the result puts dependencies first, in lexicographic order.
+    rank = {
+        component_index: position
+        for position, component_index in enumerate(
+            sorted(range(len(components)), key=lambda i: components[i][0])
+        )
+    }
+    dependencies: list[set[int]] = [set() for _ in components]
+    dependers = [0] * len(components)
+    for node, node_dependencies in graph.items():
+        for dependency in node_dependencies:
+            if component_of[dependency] != component_of[node]:
+                dependencies[component_of[node]].add(component_of[dependency])
+    for component_dependencies in dependencies:
+        for dependency in component_dependencies:
+            dependers[dependency] += 1
+
+    heap = [-rank[i] for i in range(len(components)) if not dependers[i]]
+    heapq.heapify(heap)
+    by_rank = {position: i for i, position in rank.items()}
+
     sorted_requirement_trees = []
-    graph = _RequirementTreeGraph(requirement_trees)
-    while (node := graph.next_node()) is not None:
-        sorted_requirement_trees.append(graph.get_requirement_tree(node))
+    while heap:
+        i = by_rank[-heapq.heappop(heap)]
+        component = components[i]
+        for member in reversed(component):
+            requirement_tree = table[member]
+            if len(component) > 1 or member in graph[member]:
+                requirement_tree = dataclasses.replace(
+                    requirement_tree,
+                    dependencies=requirement_tree.dependencies - set(component),
+                )
+            sorted_requirement_trees.append(requirement_tree)
+
+        for dependency in dependencies[i]:
+            dependers[dependency] -= 1
+            if not dependers[dependency]:
+                heapq.heappush(heap, -rank[dependency])
+
     sorted_requirement_trees.reverse()
     return sorted_requirement_trees
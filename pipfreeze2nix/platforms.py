@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import itertools
+import platform
+import sys
+from typing import Iterable
+from typing import Mapping
+
+from packaging.tags import compatible_tags
+from packaging.tags import cpython_tags
+from packaging.tags import mac_platforms
+from packaging.tags import sys_tags
+from packaging.tags import Tag
+
+# Newest glibc we assume a Linux target provides.
+# Wheels built against anything newer are not considered compatible.
+MAX_GLIBC_VERSION = (2, 38)
+
+# Oldest macOS release we assume a Darwin target runs,
+# matching the default deployment target of nixpkgs' Darwin stdenv.
+MACOS_VERSION = (11, 0)
+
+# Legacy manylinux tags (PEP 513, PEP 571, PEP 599),
+# keyed by the glibc minor version they are aliases for.
+LEGACY_MANYLINUX = {
+    17: ("manylinux2014", ("x86_64", "aarch64")),
+    12: ("manylinux2010", ("x86_64",)),
+    5: ("manylinux1", ("x86_64",)),
+}
+
+# Maps a nix system onto (wheel architecture, kernel).
+SYSTEMS = {
+    "x86_64-linux": ("x86_64", "linux"),
+    "aarch64-linux": ("aarch64", "linux"),
+    "x86_64-darwin": ("x86_64", "darwin"),
+    "aarch64-darwin": ("arm64", "darwin"),
+}
+
+
+def rank_tags(tags: Iterable[Tag]) -> dict[Tag, int]:
+    """\
+    Maps each tag onto its priority, where lower is better.
+    `tags` must be ordered from most to least specific, like `sys_tags()`.
+    """
+
+    priorities: dict[Tag, int] = {}
+    for priority, tag in enumerate(tags):
+        priorities.setdefault(tag, priority)
+    return priorities
+
+
+def tags_key(tag_priorities: Mapping[Tag, int]) -> str:
+    """\
+    Identifies a ranked set of tags, e.g. `cp311-3f1c0d2a9b7e4c65`:
+    the interpreter of the best tag, which tells CPython and PyPy apart,
+    followed by a digest of every tag in order of priority,
+    which tells apart interpreters, glibc versions and ABIs
+    that would choose different wheels.
+    """
+
+    ranked = sorted(tag_priorities, key=tag_priorities.__getitem__)
+    digest = hashlib.sha256("\n".join(map(str, ranked)).encode()).hexdigest()
+    interpreter = ranked[0].interpreter if ranked else "none"
+    return f"{interpreter}-{digest[:16]}"
+
+
+@functools.cache
+def current_tag_priorities() -> dict[Tag, int]:
+    return rank_tags(sys_tags())
+
+
+def host_system() -> str:
+    machine = platform.machine().lower()
+    machine = {"amd64": "x86_64", "arm64": "aarch64"}.get(machine, machine)
+    return f"{machine}-{sys.platform}"
+
+
+def linux_platforms(arch: str) -> list[str]:
+    major, max_minor = MAX_GLIBC_VERSION
+    platforms = []
+    for minor in range(max_minor, 4, -1):
+        platforms.append(f"manylinux_{major}_{minor}_{arch}")
+        legacy_name, legacy_arches = LEGACY_MANYLINUX.get(minor, ("", ()))
+        if arch in legacy_arches:
+            platforms.append(f"{legacy_name}_{arch}")
+    platforms.append(f"linux_{arch}")
+    return platforms
+
+
+def system_platforms(system: str) -> list[str]:
+    try:
+        arch, kernel = SYSTEMS[system]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported system `{system}`. "
+            f"Supported systems are: {', '.join(SYSTEMS)}."
+        )
+
+    if kernel == "linux":
+        return linux_platforms(arch)
+    return list(mac_platforms(MACOS_VERSION, arch))
+
+
+@functools.cache
+def system_tag_priorities(
+    system: str, python_version: tuple[int, int]
+) -> dict[Tag, int]:
+    """\
+    Ranks the tags that CPython `python_version` supports on the nix `system`,
+    in the same order `sys_tags()` would produce on that system.
+    """
+
+    platforms = system_platforms(system)
+    interpreter = f"cp{python_version[0]}{python_version[1]}"
+    return rank_tags(
+        itertools.chain(
+            cpython_tags(python_version, platforms=platforms),
+            compatible_tags(python_version, interpreter, platforms=platforms),
+        )
+    )
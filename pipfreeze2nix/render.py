@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import tempfile
+import textwrap
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Mapping
+from typing import TextIO
+
+from pipfreeze2nix.lockfile import render_context
+from pipfreeze2nix.nixpkgs_index import nix_attr
+from pipfreeze2nix.resolve import parse_pinned_version
+from pipfreeze2nix.resolve import ResolvedRequirement
+
+
+def generate_build_python_package(resolved: ResolvedRequirement) -> str:
+    req = resolved.requirement_tree.req
+    if resolved.nixpkgs_attr is not None:
+        return f"{req.name} = python.pkgs.{nix_attr(resolved.nixpkgs_attr)};\n"
+
+    dependencies = textwrap.indent(
+        "\n".join(sorted(resolved.requirement_tree.dependencies)),
+        prefix="    ",
+    )
+
+    unique_artifacts = set(resolved.artifacts.values())
+    if len(unique_artifacts) == 1:
+        (artifact,) = unique_artifacts
+        template = """\
+        {name} = (python.pkgs.buildPythonPackage rec {{
+          pname = "{name}";
+          version = "{version}";
+          format = "{artifact_format}";
+
+          doCheck = false;
+
+          propagatedBuildInputs = [
+        {dependencies}
+          ];
+
+          src = nixpkgs.fetchurl {{
+            url = "{url}";
+            hash = "{hash}";
+          }};
+        }});
+        """
+        template = textwrap.dedent(template)
+        return template.format(
+            name=req.name,
+            version=parse_pinned_version(req),
+            artifact_format=artifact.artifact_format,
+            dependencies=dependencies,
+            url=artifact.url,
+            hash=artifact.hash,
+        )
+
+    per_system = "\n".join(
+        f'{system} = {{ format = "{artifact.artifact_format}"; '
+        f'url = "{artifact.url}"; hash = "{artifact.hash}"; }};'
+        for system, artifact in sorted(resolved.artifacts.items())
+    )
+    template = """\
+    {name} = let
+      artifact = {{
+    {per_system}
+      }}.${{nixpkgs.stdenv.hostPlatform.system}};
+    in (python.pkgs.buildPythonPackage rec {{
+      pname = "{name}";
+      version = "{version}";
+      format = artifact.format;
+
+      doCheck = false;
+
+      propagatedBuildInputs = [
+    {dependencies}
+      ];
+
+      src = nixpkgs.fetchurl {{
+        inherit (artifact) url hash;
+      }};
+    }});
+    """
+    template = textwrap.dedent(template)
+    return template.format(
+        name=req.name,
+        version=parse_pinned_version(req),
+        per_system=textwrap.indent(per_system, prefix="    "),
+        dependencies=dependencies,
+    )
+
+
+FILE_HEADER = """\
+{ python, nixpkgs }:
+let
+"""
+
+FILE_FOOTER = """\
+in
+[
+{package_list}
+]
+"""
+
+# The Nix function written next to a JSON lock by `--output-format json`.
+# It is the same for every lock, so only the lock changes between runs.
+LOCK_NIX_TPL = """\
+{{ python, nixpkgs }}:
+let
+  lock = builtins.fromJSON (builtins.readFile (./. + "/{lock_file}"));
+  system = nixpkgs.stdenv.hostPlatform.system;
+  build = package:
+    let
+      artifact = if package ? systems then package.systems.${{system}} else package;
+    in
+    if package ? nixpkgs then python.pkgs.${{package.nixpkgs}}
+    else python.pkgs.buildPythonPackage {{
+      pname = package.name;
+      inherit (package) version;
+      inherit (artifact) format;
+
+      doCheck = false;
+
+      propagatedBuildInputs = map (name: packages.${{name}}) package.dependencies;
+
+      src = nixpkgs.fetchurl {{
+        inherit (artifact) url hash;
+      }};
+    }};
+  packages = builtins.listToAttrs (
+    map (package: {{ inherit (package) name; value = build package; }}) lock.packages
+  );
+in
+map (name: packages.${{name}}) lock.direct
+"""
+
+OUTPUT_FORMATS = ("nix", "json")
+
+
+def get_out_file(in_file: Path) -> Path:
+    in_file_name = in_file.name
+    in_file_name, _, _ = in_file_name.rpartition(".")
+    out_file_name = f"{in_file_name}.nix"
+    return in_file.parent / out_file_name
+
+
+def get_lock_file(out_file: Path) -> Path:
+    return out_file.with_suffix(".lock.json")
+
+
+def write_atomically(path: Path, write: Callable[[TextIO], None]) -> None:
+    """\
+    Streams a file through `write` into a temporary file next to `path`,
+    and renames it over `path` once complete,
+    so that readers never see a partially written file.
+    """
+
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            write(f)
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def write_requirements_nix(
+    out: TextIO,
+    resolved_requirements: Iterable[ResolvedRequirement],
+    context: Mapping[str, Any] | None = None,
+) -> None:
+    package_list = []
+    if context is not None:
+        out.write(render_context(context))
+    out.write(FILE_HEADER)
+    for resolved in resolved_requirements:
+        out.write(textwrap.indent(generate_build_python_package(resolved), prefix="  "))
+        if resolved.requirement_tree.is_direct:
+            package_list.append(resolved.requirement_tree.req.name)
+    out.write(
+        FILE_FOOTER.format(
+            package_list=textwrap.indent("\n".join(sorted(package_list)), prefix="  ")
+        )
+    )
+
+
+def render_requirements_nix(resolved_requirements: list[ResolvedRequirement]) -> str:
+    out = io.StringIO()
+    write_requirements_nix(out, resolved_requirements)
+    return out.getvalue()
+
+
+def lock_entry(resolved: ResolvedRequirement) -> dict:
+    req = resolved.requirement_tree.req
+    entry = {
+        "name": req.name,
+        "version": str(parse_pinned_version(req)),
+        "dependencies": sorted(resolved.requirement_tree.dependencies),
+    }
+    if resolved.nixpkgs_attr is not None:
+        entry["nixpkgs"] = resolved.nixpkgs_attr
+        return entry
+
+    unique_artifacts = set(resolved.artifacts.values())
+    if len(unique_artifacts) == 1:
+        (artifact,) = unique_artifacts
+        entry.update(
+            format=artifact.artifact_format, url=artifact.url, hash=artifact.hash
+        )
+    else:
+        entry["systems"] = {
+            system: {
+                "format": artifact.artifact_format,
+                "url": artifact.url,
+                "hash": artifact.hash,
+            }
+            for system, artifact in sorted(resolved.artifacts.items())
+        }
+    return entry
+
+
+def write_requirements_lock(
+    out: TextIO,
+    resolved_requirements: Iterable[ResolvedRequirement],
+    context: Mapping[str, Any] | None = None,
+) -> None:
+    """\
+    Writes the JSON lock read by LOCK_NIX_TPL, one package per line.
+    """
+
+    package_list = []
+    out.write('{"version": 1, ')
+    if context is not None:
+        out.write(f'"context": {json.dumps(context, sort_keys=True)}, ')
+    out.write('"packages": [')
+    separator = "\n"
+    for resolved in resolved_requirements:
+        out.write(separator)
+        out.write(json.dumps(lock_entry(resolved)))
+        separator = ",\n"
+        if resolved.requirement_tree.is_direct:
+            package_list.append(resolved.requirement_tree.req.name)
+    out.write(f'\n], "direct": {json.dumps(sorted(package_list))}}}\n')
+
+
+def write_output(
+    out_file: Path,
+    resolved_requirements: list[ResolvedRequirement],
+    output_format: str,
+    context: Mapping[str, Any] | None = None,
+) -> None:
+    if output_format == "json":
+        lock_file = get_lock_file(out_file)
+        write_atomically(
+            lock_file,
+            lambda f: write_requirements_lock(f, resolved_requirements, context),
+        )
+        write_atomically(
+            out_file, lambda f: f.write(LOCK_NIX_TPL.format(lock_file=lock_file.name))
+        )
+    else:
+        write_atomically(
+            out_file,
+            lambda f: write_requirements_nix(f, resolved_requirements, context),
+        )
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from packaging.utils import canonicalize_name
+
+from pipfreeze2nix.hashes import normalize_hash
+from pipfreeze2nix.lockfile import LockedArtifact
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS resolutions (
+    index_url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    url TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    format TEXT NOT NULL,
+    -- An SRI hash, or a hex sha256 in rows written before SRI hashes.
+    sha256 TEXT NOT NULL,
+    resolved_at REAL NOT NULL,
+    PRIMARY KEY (index_url, name, version, platform)
+) WITHOUT ROWID
+"""
+
+GET_QUERY = """\
+SELECT url, sha256, format FROM resolutions
+WHERE index_url = ? AND name = ? AND version = ? AND platform = ?
+"""
+
+PUT_QUERY = """\
+INSERT OR REPLACE INTO resolutions
+(index_url, name, version, platform, url, filename, format, sha256, resolved_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+FILE_DIGESTS_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS file_digests (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (path, size, mtime_ns)
+) WITHOUT ROWID
+"""
+
+GET_FILE_DIGEST_QUERY = """\
+SELECT sha256 FROM file_digests WHERE path = ? AND size = ? AND mtime_ns = ?
+"""
+
+PUT_FILE_DIGEST_QUERY = """\
+INSERT OR REPLACE INTO file_digests (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)
+"""
+
+
+class ResolutionStore:
+    """\
+    A persistent record of which artifact was chosen for a pinned requirement,
+    keyed by (index URL, normalized name, version, platform).
+
+    For a fixed index, pin and platform the chosen artifact never changes,
+    so a stored resolution lets later runs skip the index and the download entirely.
+    Artifacts from local directories are not stored,
+    since a file can be rebuilt in place under the same name.
+
+    The database uses SQLite's write-ahead log with a generous busy timeout,
+    so that parallel jobs on one host can read and write it at the same time.
+    Each thread gets its own connection.
+
+    It also remembers the digests of local files by path, size and mtime,
+    so that unchanged files are never hashed twice.
+    """
+
+    def __init__(self, path: Path, busy_timeout: float = 30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.execute(SCHEMA)
+            connection.execute(FILE_DIGESTS_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(
+        self, index_url: str, name: str, version: str, platform: str
+    ) -> LockedArtifact | None:
+        row = (
+            self._connection()
+            .execute(
+                GET_QUERY,
+                (index_url, canonicalize_name(name), version, platform),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+
+        url, artifact_hash, artifact_format = row
+        return LockedArtifact(
+            url=url,
+            hash=normalize_hash(artifact_hash),
+            artifact_format=artifact_format,
+        )
+
+    def put(
+        self,
+        index_url: str,
+        name: str,
+        version: str,
+        platform: str,
+        filename: str,
+        artifact: LockedArtifact,
+    ) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                PUT_QUERY,
+                (
+                    index_url,
+                    canonicalize_name(name),
+                    version,
+                    platform,
+                    artifact.url,
+                    filename,
+                    artifact.artifact_format,
+                    artifact.hash,
+                    time.time(),
+                ),
+            )
+
+    def get_file_digest(self, path: str, size: int, mtime_ns: int) -> str | None:
+        row = (
+            self._connection()
+            .execute(GET_FILE_DIGEST_QUERY, (path, size, mtime_ns))
+            .fetchone()
+        )
+        return None if row is None else row[0]
+
+    def put_file_digest(self, path: str, size: int, mtime_ns: int, sha256: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(PUT_FILE_DIGEST_QUERY, (path, size, mtime_ns, sha256))
@@ -0,0 +1,588 @@
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import functools
+import sys
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Mapping
+from typing import MutableMapping
+from typing import Sequence
+
+from packaging.requirements import Requirement
+from packaging.tags import Tag
+from packaging.utils import InvalidWheelFilename
+from packaging.utils import parse_sdist_filename
+from packaging.utils import parse_wheel_filename
+from packaging.version import InvalidVersion
+from packaging.version import Version
+
+from pipfreeze2nix import pep503
+from pipfreeze2nix.artifact_cache import ArtifactCache
+from pipfreeze2nix.download import DOWNLOAD_SEGMENTS
+from pipfreeze2nix.download import fetch_artifact
+from pipfreeze2nix.download import SEGMENT_THRESHOLD
+from pipfreeze2nix.exceptions import MissingArtifactError
+from pipfreeze2nix.exceptions import OfflineCacheMissError
+from pipfreeze2nix.find_links import file_sha256
+from pipfreeze2nix.find_links import file_url_path
+from pipfreeze2nix.find_links import FileHasher
+from pipfreeze2nix.find_links import FindLinks
+from pipfreeze2nix.find_links import is_file_url
+from pipfreeze2nix.find_links import map_url
+from pipfreeze2nix.hashes import best_sri
+from pipfreeze2nix.hashes import to_sri
+from pipfreeze2nix.index_cache import IndexCache
+from pipfreeze2nix.lockfile import lock_key
+from pipfreeze2nix.lockfile import LockedArtifact
+from pipfreeze2nix.nixpkgs_index import NixpkgsIndex
+from pipfreeze2nix.platforms import current_tag_priorities
+from pipfreeze2nix.platforms import host_system
+from pipfreeze2nix.platforms import tags_key
+from pipfreeze2nix.pip_compile_parser import RequirementTree
+from pipfreeze2nix.resolution_store import ResolutionStore
+from pipfreeze2nix.timings import Recorder
+from pipfreeze2nix.transport import default_transport
+from pipfreeze2nix.transport import Transport
+
+
+# (done) step 0) get it working with sdists
+# (done) step 1) get it working with wheels on current platform
+# (done) step 2) get it working with wheels across multiple platforms
+
+
+# ok...trying to make this work with wheels is going to be fun :)
+#
+# 1. assume that the python used to build requirements.nix
+#    is the same python that will be used to run the project
+#
+# 2. need to implement PEP <whatever> simple server parsing
+#    and then find all available wheels for a pinned version of a thing
+#
+# 3. need to map from wheel name to nix system name
+#    e.g.
+
+# aarch64-darwin maps onto macosx_<number>_<number>-arm64.whl
+#  - zope.interface-5.4.0-cp38-cp38-macosx_10_14_arm64.whl (217 kB)
+#  - zope.interface-5.4.0-cp38-cp38-macosx_10_14_x86_64.whl (208 kB)
+#
+# arm64 -> aarch64
+# x86_64 -> x86_64
+
+
+def parse_pinned_version(req: Requirement) -> Version:
+    if len(req.specifier) != 1:
+        raise ValueError(f"Requirement `{req}` has more than one specifier.")
+
+    for specifier in req.specifier:
+        if specifier.operator != "==":
+            raise ValueError(f"Requirement `{req}` has a non-pinned specifier.")
+        return Version(specifier.version)
+
+    raise SystemExit(
+        "Unexpected control flow in `parse_pinned_version` "
+        f"when parsing requirement `{req}`. "
+        "This should not be able to happen."
+    )
+
+
+@dataclass(frozen=True)
+class ResolveOptions:
+    index_cache: IndexCache | None = None
+    artifact_cache: ArtifactCache | None = None
+    offline: bool = False
+    locked_artifacts: Mapping[tuple[str, str], LockedArtifact] = field(
+        default_factory=dict
+    )
+    transport: Transport = field(default_factory=default_transport)
+    # Maps each nix system to lock for onto the ranked tags it supports.
+    targets: Mapping[str, Mapping[Tag, int]] = field(
+        default_factory=lambda: {host_system(): current_tag_priorities()}
+    )
+    python_version: tuple[int, int] = sys.version_info[:2]
+    resolution_store: ResolutionStore | None = None
+    # Record resolutions in `resolution_store` without looking them up.
+    refresh: bool = False
+    recorder: Recorder = field(default_factory=Recorder)
+    # Local directories searched before the index.
+    find_links: FindLinks | None = None
+    # Only resolve from `find_links`.
+    no_index: bool = False
+    # (from, to) prefixes rewritten in the URLs written to the output.
+    url_prefixes: Sequence[tuple[str, str]] = ()
+    # Hashes `find_links` artifacts; they are hashed in place without one.
+    file_hasher: FileHasher | None = None
+    # Indexes to resolve from, highest priority first.
+    # Empty means just `pep503.get_index_url()`.
+    index_urls: Sequence[str] = ()
+    # One of INDEX_STRATEGIES; see `get_index_artifacts`.
+    index_strategy: str = "first-index"
+    # Requirements whose exact version is in nixpkgs are taken from it.
+    nixpkgs_index: NixpkgsIndex | None = None
+    # Artifacts of at least `segment_threshold` bytes are downloaded
+    # in this many concurrent byte ranges.
+    download_segments: int = DOWNLOAD_SEGMENTS
+    segment_threshold: int = SEGMENT_THRESHOLD
+
+    @functools.cached_property
+    def platform_keys(self) -> dict[str, str]:
+        """\
+        Maps each target system onto the key its resolutions are stored under.
+        Computed once, since ranking every tag for every requirement would add up.
+        """
+
+        return {
+            system: f"{system}-{tags_key(tag_priorities)}"
+            for system, tag_priorities in self.targets.items()
+        }
+
+
+def get_artifact_hash(
+    artifact: pep503.Artifact, options: ResolveOptions | None = None
+) -> str:
+    """\
+    Returns the SRI hash of `artifact`,
+    preferring the strongest digest the index publishes,
+    and only hashing the artifact itself when there is none.
+    """
+
+    if options is None:
+        options = ResolveOptions()
+
+    if (sri := best_sri(artifact.hashes)) is not None:
+        options.recorder.count("index_hash")
+        return sri
+
+    if is_file_url(artifact.url):
+        path = file_url_path(artifact.url)
+        with options.recorder.span("hash", url=artifact.url):
+            if options.file_hasher is not None:
+                return to_sri("sha256", options.file_hasher.sha256(path))
+            return to_sri("sha256", file_sha256(path))
+
+    artifact_cache = options.artifact_cache
+    if artifact_cache is not None:
+        if (sha256 := artifact_cache.get_sha256(artifact.url)) is not None:
+            options.recorder.count("artifact_cache.hit")
+            return to_sri("sha256", sha256)
+        options.recorder.count("artifact_cache.miss")
+
+    if options.offline:
+        raise OfflineCacheMissError(f"Artifact {artifact.url} is not cached.")
+
+    if artifact_cache is None:
+        return to_sri(
+            "sha256",
+            fetch_artifact(
+                artifact.url,
+                None,
+                options.transport,
+                options.recorder,
+                artifact.size,
+                options.download_segments,
+                options.segment_threshold,
+            ),
+        )
+
+    with artifact_cache.partial_download(artifact.url) as partial_path:
+        # Another process may have downloaded it while we waited for the lock.
+        if (sha256 := artifact_cache.get_sha256(artifact.url)) is not None:
+            return to_sri("sha256", sha256)
+        sha256 = fetch_artifact(
+            artifact.url,
+            partial_path,
+            options.transport,
+            options.recorder,
+            artifact.size,
+            options.download_segments,
+            options.segment_threshold,
+        )
+        artifact_cache.add(artifact.url, partial_path, sha256)
+    return to_sri("sha256", sha256)
+
+
+INDEX_STRATEGIES = ("first-index", "merge")
+
+
+def get_index_urls(options: ResolveOptions) -> list[str]:
+    return list(options.index_urls) or [pep503.get_index_url()]
+
+
+def get_index_artifacts(
+    name: str, options: ResolveOptions, version: Version | None = None
+) -> list[pep503.Artifact]:
+    """\
+    Asks every index for `name` at once,
+    so that a package costs one round trip however many indexes there are.
+    Given a `version`, indexes only list the artifacts of that version.
+
+    With the "first-index" strategy, artifacts come from the highest priority index
+    that has the project at all, so that a project on a private index
+    cannot be shadowed by a project of the same name on a public one.
+    With "merge", the artifacts of every index are pooled, like pip does.
+    """
+
+    index_urls = get_index_urls(options)
+
+    def find(index_url: str) -> list[pep503.Artifact] | None:
+        return pep503.find_artifacts(
+            name,
+            options.index_cache,
+            options.transport,
+            options.recorder,
+            index_url,
+            version,
+        )
+
+    if len(index_urls) == 1:
+        return find(index_urls[0]) or []
+
+    executor = ThreadPoolExecutor(max_workers=len(index_urls))
+    try:
+        futures = [executor.submit(find, index_url) for index_url in index_urls]
+        if options.index_strategy == "merge":
+            return [
+                artifact for future in futures for artifact in future.result() or []
+            ]
+        # An index that has the project but not the pinned version
+        # still shadows the indexes after it.
+        for future in futures:
+            if (artifacts := future.result()) is not None:
+                return artifacts
+        return []
+    finally:
+        # Lower priority indexes aren't waited for once a higher priority one answered.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def choose_wheel(
+    artifacts: list[pep503.Artifact],
+    name: str,
+    pinned_version: Version,
+    tag_priorities: Mapping[Tag, int] | None = None,
+) -> pep503.Artifact | None:
+    """\
+    Chooses the most specific wheel compatible with `tag_priorities`,
+    which defaults to the tags supported by the running interpreter.
+    Ties are broken by filename.
+    """
+
+    if tag_priorities is None:
+        tag_priorities = current_tag_priorities()
+
+    best_wheel = None
+    best_rank = None
+    version_matches = pep503.VersionFilter(pinned_version)
+    for artifact in artifacts:
+        if not artifact.name.endswith(".whl"):
+            continue
+        if not version_matches(artifact.name):
+            continue
+
+        try:
+            _, _, _, tags = parse_wheel_filename(artifact.name)
+        except (InvalidVersion, InvalidWheelFilename):
+            continue
+
+        priority = min(
+            (tag_priorities[tag] for tag in tags if tag in tag_priorities),
+            default=None,
+        )
+        if priority is None:
+            continue
+
+        rank = (priority, artifact.name)
+        if best_rank is None or rank < best_rank:
+            best_wheel, best_rank = artifact, rank
+
+    return best_wheel
+
+
+def choose_sdist(
+    artifacts: list[pep503.Artifact], name: str, pinned_version: Version
+) -> pep503.Artifact | None:
+    compatible_sdists = []
+    for artifact in artifacts:
+        if not artifact.name.endswith(".tar.gz") or artifact.name.endswith(".zip"):
+            continue
+
+        try:
+            _, version = parse_sdist_filename(artifact.name)
+        except InvalidVersion:
+            continue
+
+        if version != pinned_version:
+            continue
+
+        compatible_sdists.append(artifact)
+
+    if not compatible_sdists:
+        return None
+
+    return compatible_sdists[0]
+
+
+def select_artifact(
+    artifacts: list[pep503.Artifact],
+    req: Requirement,
+    tag_priorities: Mapping[Tag, int] | None = None,
+) -> pep503.Artifact:
+    pinned_version = parse_pinned_version(req)
+    if (
+        wheel_package := choose_wheel(
+            artifacts, req.name, pinned_version, tag_priorities
+        )
+    ) is not None:
+        return wheel_package
+
+    if (sdist_package := choose_sdist(artifacts, req.name, pinned_version)) is not None:
+        return sdist_package
+
+    raise MissingArtifactError(f"Cannot find artifact for package {req}.")
+
+
+@dataclass(frozen=True)
+class ResolvedRequirement:
+    requirement_tree: RequirementTree
+    # Keyed by nix system.
+    artifacts: Mapping[str, LockedArtifact]
+    # The `python.pkgs` attribute providing the requirement, instead of `artifacts`.
+    nixpkgs_attr: str | None = None
+
+
+def resolution_source(options: ResolveOptions) -> str:
+    """\
+    Identifies where artifacts are resolved from,
+    so that the resolution database keeps resolutions from different sources apart.
+    """
+
+    return " ".join(resolution_sources(options))
+
+
+def resolution_sources(options: ResolveOptions) -> list[str]:
+    sources = []
+    if options.find_links is not None:
+        sources = [directory.as_uri() for directory in options.find_links.directories]
+    if not options.no_index:
+        index_urls = get_index_urls(options)
+        sources.extend(index_urls)
+        if len(index_urls) > 1:
+            sources.append(options.index_strategy)
+    return sources
+
+
+def lock_context(options: ResolveOptions) -> dict[str, Any]:
+    """\
+    Records what a lock was resolved from and for,
+    so that its entries are only reused when resolving the same way.
+    Since locks are committed, credentials are left out of their URLs.
+    """
+
+    return {
+        "source": " ".join(map(pep503.redact_url, resolution_sources(options))),
+        "url_prefixes": [
+            list(map(pep503.redact_url, prefix)) for prefix in options.url_prefixes
+        ],
+        "platforms": options.platform_keys,
+    }
+
+
+def map_artifact_urls(
+    artifacts: Mapping[str, LockedArtifact], options: ResolveOptions
+) -> dict[str, LockedArtifact]:
+    return {
+        system: dataclasses.replace(
+            artifact, url=map_url(artifact.url, options.url_prefixes)
+        )
+        for system, artifact in artifacts.items()
+    }
+
+
+def resolve_requirement(
+    requirement_tree: RequirementTree, options: ResolveOptions | None = None
+) -> ResolvedRequirement:
+    if options is None:
+        options = ResolveOptions()
+    req = requirement_tree.req
+    with options.recorder.span("resolve", name=req.name):
+        return _resolve_requirement(requirement_tree, options)
+
+
+def _resolve_requirement(
+    requirement_tree: RequirementTree, options: ResolveOptions
+) -> ResolvedRequirement:
+    req = requirement_tree.req
+    if options.nixpkgs_index is not None:
+        nixpkgs_attr = options.nixpkgs_index.get(req.name, parse_pinned_version(req))
+        if nixpkgs_attr is not None:
+            options.recorder.count("nixpkgs.hit")
+            return ResolvedRequirement(
+                requirement_tree=requirement_tree,
+                artifacts={},
+                nixpkgs_attr=nixpkgs_attr,
+            )
+        options.recorder.count("nixpkgs.miss")
+
+    local_artifacts: list[pep503.Artifact] = []
+    if options.find_links is not None:
+        local_artifacts = options.find_links.get_artifacts(
+            req.name, parse_pinned_version(req)
+        )
+
+    # Local artifacts may be rebuilt in place under the same name,
+    # so pins that have any are not taken from the lock or the resolution database;
+    # FileHasher only hashes them again when their size or mtime changed.
+    if options.locked_artifacts and not local_artifacts:
+        locked_artifact = options.locked_artifacts.get(
+            lock_key(req.name, parse_pinned_version(req))
+        )
+        if locked_artifact is not None:
+            options.recorder.count("lockfile.hit")
+            return ResolvedRequirement(
+                requirement_tree=requirement_tree,
+                artifacts={system: locked_artifact for system in options.targets},
+            )
+        options.recorder.count("lockfile.miss")
+
+    pinned_version = str(parse_pinned_version(req))
+    source = resolution_source(options)
+    locked_by_system: dict[str, LockedArtifact] = {}
+    if (
+        options.resolution_store is not None
+        and not options.refresh
+        and not local_artifacts
+    ):
+        for system in options.targets:
+            stored = options.resolution_store.get(
+                source, req.name, pinned_version, options.platform_keys[system]
+            )
+            if stored is not None:
+                options.recorder.count("resolution_store.hit")
+                locked_by_system[system] = stored
+            else:
+                options.recorder.count("resolution_store.miss")
+
+    unresolved_systems = [
+        system for system in options.targets if system not in locked_by_system
+    ]
+    if not unresolved_systems:
+        return ResolvedRequirement(
+            requirement_tree=requirement_tree,
+            artifacts=map_artifact_urls(locked_by_system, options),
+        )
+
+    # Local artifacts are preferred, and the index is only asked for targets
+    # they don't cover. Its page is fetched at most once and evaluated
+    # for every such target, and artifacts shared between targets
+    # are only hashed once.
+    index_artifacts: list[pep503.Artifact] | None = None
+    locked_by_url: dict[str, LockedArtifact] = {}
+    for system in unresolved_systems:
+        tag_priorities = options.targets[system]
+        artifact = None
+        if local_artifacts:
+            with options.recorder.span("choose_artifact", name=req.name):
+                with contextlib.suppress(MissingArtifactError):
+                    artifact = select_artifact(local_artifacts, req, tag_priorities)
+
+        if artifact is None and not options.no_index:
+            if index_artifacts is None:
+                with options.recorder.span("get_artifacts", name=req.name):
+                    index_artifacts = get_index_artifacts(
+                        req.name, options, parse_pinned_version(req)
+                    )
+            with options.recorder.span("choose_artifact", name=req.name):
+                with contextlib.suppress(MissingArtifactError):
+                    artifact = select_artifact(index_artifacts, req, tag_priorities)
+
+        if artifact is None:
+            if len(options.targets) == 1:
+                raise MissingArtifactError(f"Cannot find artifact for package {req}.")
+            raise MissingArtifactError(
+                f"Cannot find artifact for package {req} on {system}."
+            )
+
+        if artifact.url not in locked_by_url:
+            # TODO: support other formats like pyproject
+            locked_by_url[artifact.url] = LockedArtifact(
+                url=artifact.url,
+                hash=get_artifact_hash(artifact, options),
+                artifact_format="wheel" if artifact.is_wheel else "setuptools",
+            )
+        locked_by_system[system] = locked_by_url[artifact.url]
+
+        if options.resolution_store is not None and not is_file_url(artifact.url):
+            options.resolution_store.put(
+                source,
+                req.name,
+                pinned_version,
+                options.platform_keys[system],
+                artifact.name,
+                locked_by_system[system],
+            )
+
+    return ResolvedRequirement(
+        requirement_tree=requirement_tree,
+        artifacts=map_artifact_urls(
+            {system: locked_by_system[system] for system in options.targets}, options
+        ),
+    )
+
+
+def requirement_key(requirement_tree: RequirementTree) -> tuple[str, str]:
+    req = requirement_tree.req
+    return lock_key(req.name, parse_pinned_version(req))
+
+
+def resolve_requirements(
+    requirement_trees: list[RequirementTree],
+    jobs: int,
+    options: ResolveOptions | None = None,
+    resolved: MutableMapping[tuple[str, str], ResolvedRequirement] | None = None,
+) -> list[ResolvedRequirement]:
+    """\
+    Resolves every RequirementTree concurrently across at most `jobs` threads.
+    Requirements that pin the same normalized name and version
+    are only resolved once.
+    Pins already in `resolved` aren't resolved at all,
+    and new resolutions are added to it.
+    The result is in the same order as `requirement_trees`,
+    regardless of the order in which resolutions finish.
+    """
+
+    if options is None:
+        options = ResolveOptions()
+    if resolved is None:
+        resolved = {}
+    unique_trees: dict[tuple[str, str], RequirementTree] = {}
+    for requirement_tree in requirement_trees:
+        key = requirement_key(requirement_tree)
+        if key not in resolved:
+            unique_trees.setdefault(key, requirement_tree)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(resolve_requirement, requirement_tree, options): key
+            for key, requirement_tree in unique_trees.items()
+        }
+        for i, future in enumerate(as_completed(futures)):
+            msg = (
+                f"Processed {i + 1}/{len(unique_trees)} "
+                f"({(i + 1) / len(unique_trees):.2%}) "
+                f"{unique_trees[futures[future]].req.name}"
+            )
+            print(msg, file=sys.stderr)
+
+        resolved.update((key, future.result()) for future, key in futures.items())
+
+    return [
+        dataclasses.replace(
+            resolved[requirement_key(requirement_tree)],
+            requirement_tree=requirement_tree,
+        )
+        for requirement_tree in requirement_trees
+    ]
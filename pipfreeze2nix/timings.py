@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Any
+from typing import Iterator
+from typing import Mapping
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    # Seconds since the recorder was created.
+    start: float
+    duration: float
+    thread_id: int
+    args: Mapping[str, Any] = field(default_factory=dict)
+
+
+class Recorder:
+    """\
+    Collects timed spans and counters from every thread of a run.
+
+    A disabled recorder, which is the default, records nothing,
+    so instrumented code can use one unconditionally.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans: list[Span] = []
+        self._counters: Counter[str] = Counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, /, **args: Any) -> Iterator[dict[str, Any]]:
+        """\
+        Times the body of the `with` block.
+        The yielded dict can be used to attach more args to the span.
+        """
+
+        if not self.enabled:
+            yield args
+            return
+
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            span = Span(
+                name=name,
+                start=start - self._origin,
+                duration=end - start,
+                thread_id=threading.get_ident(),
+                args=args,
+            )
+            with self._lock:
+                self._spans.append(span)
+
+    def count(self, counter: str, amount: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[counter] += amount
+
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def counters(self) -> Counter[str]:
+        with self._lock:
+            return Counter(self._counters)
+
+    def write_trace(self, path: Path) -> None:
+        """\
+        Writes every span as a complete event in the Chrome trace event format,
+        which chrome://tracing, Perfetto and speedscope can display.
+        """
+
+        pid = os.getpid()
+        thread_numbers: dict[int, int] = {}
+        events = []
+        for span in self.spans():
+            tid = thread_numbers.setdefault(span.thread_id, len(thread_numbers))
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": span.start * 1e6,
+                    "dur": span.duration * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": dict(span.args),
+                }
+            )
+        path.write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}) + "\n"
+        )
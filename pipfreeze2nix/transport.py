@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class TransportStats:
+    requests: int
+    connections_opened: int
+    connections_reused: int
+    retries: int
+
+
+def parse_retry_after(value: Optional[str]) -> float | None:
+    """\
+    Parses a Retry-After header, which is either a number of seconds
+    or an HTTP date, into a number of seconds to wait.
+    """
+
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class CountingAdapter(HTTPAdapter):
+    """\
+    An HTTPAdapter that counts the requests it sends
+    and the connections its pools open.
+    The counts are kept here rather than read from the pools,
+    which the pool manager evicts once it holds more than `pool_connections`.
+    Connections are counted by pool classes that only this adapter's
+    pool managers use, so other sessions in the process are left alone.
+    """
+
+    def __init__(self, **kwargs):
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+        super().__init__(**kwargs)
+
+    def _count_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def _count_connections(self, manager: PoolManager) -> None:
+        """\
+        Overrides the pool classes of `manager` alone with counting subclasses.
+        """
+
+        adapter = self
+
+        def counting(pool_class):
+            class CountingPool(pool_class):
+                def _new_conn(self):
+                    adapter._count_connection()
+                    return super()._new_conn()
+
+            return CountingPool
+
+        manager.pool_classes_by_scheme = {
+            scheme: counting(pool_class)
+            for scheme, pool_class in manager.pool_classes_by_scheme.items()
+        }
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self._count_connections(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        is_new = proxy not in self.proxy_manager
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if is_new:
+            self._count_connections(manager)
+        return manager
+
+    def counts(self) -> tuple[int, int]:
+        """\
+        Returns the number of requests sent and connections opened so far.
+        """
+
+        with self._lock:
+            return self.requests_sent, self.connections_opened
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests_sent += 1
+        return super().send(request, **kwargs)
+
+
+class Transport:
+    """\
+    A shared HTTP session for talking to indexes and downloading artifacts.
+
+    Connections are kept alive and pooled per host,
+    with at most `max_connections_per_host` open to any one host;
+    further requests to that host wait for a connection to free up.
+    Requests that fail with a connection error or a retryable status code
+    are retried with exponential backoff, honoring `Retry-After`.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 10,
+        retries: int = 5,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 60.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+    ):
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.adapter = CountingAdapter(
+            pool_connections=32,
+            pool_maxsize=max_connections_per_host,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        self._retries_performed = 0
+
+    def _backoff(self, attempt: int, response: requests.Response | None) -> float:
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+        return min(self.backoff_factor * 2**attempt, self.max_backoff)
+
+    def wait_to_retry(
+        self, attempt: int, response: requests.Response | None = None
+    ) -> None:
+        """\
+        Sleeps before retry number `attempt` (counting from 0) of a request,
+        for callers that retry requests themselves.
+        """
+
+        time.sleep(self._backoff(attempt, response))
+        with self._lock:
+            self._retries_performed += 1
+
+    def get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        stream: bool = False,
+        retries: int | None = None,
+    ) -> requests.Response:
+        """\
+        Sends a GET request, retrying it up to `retries` times,
+        by default the transport's `retries`.
+        """
+
+        if retries is None:
+            retries = self.retries
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.get(
+                    url,
+                    headers=headers,
+                    stream=stream,
+                    timeout=self.timeout,
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if attempt >= retries:
+                    return response
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+
+            self.wait_to_retry(attempt, response)
+            attempt += 1
+
+    def stats(self) -> TransportStats:
+        total_requests, connections_opened = self.adapter.counts()
+        with self._lock:
+            retries = self._retries_performed
+
+        return TransportStats(
+            requests=total_requests,
+            connections_opened=connections_opened,
+            connections_reused=total_requests - connections_opened,
+            retries=retries,
+        )
+
+
+@functools.cache
+def default_transport() -> Transport:
+    return Transport()
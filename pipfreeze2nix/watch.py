@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Iterable
+
+# From <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Editors and pip-compile replace files by renaming a new file over them,
+# which only shows up as an event on the directory.
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """\
+    A minimal binding to Linux's inotify through libc,
+    reporting the names of files changed in a set of watched directories.
+    """
+
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._directories: dict[int, Path] = {}
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            return hasattr(ctypes.CDLL(None), "inotify_init1")
+        except OSError:
+            return False
+
+    def add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(directory))
+        self._directories[wd] = directory
+
+    def read(self, timeout: float | None) -> list[Path]:
+        """\
+        Waits up to `timeout` seconds for events,
+        and returns the paths of the files they are about.
+        """
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self._directories and name:
+                paths.append(self._directories[wd] / os.fsdecode(name))
+        return paths
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Watcher:
+    """\
+    Waits for the contents of a set of files to change.
+
+    Uses inotify where it is available, and polls modification times otherwise.
+    Changes are reported once the files have been quiet for `debounce` seconds,
+    so that a file written in several steps is only reported once,
+    and files that were rewritten with the same contents are not reported at all.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        debounce: float = 0.05,
+        poll_interval: float = 0.5,
+        use_inotify: bool | None = None,
+    ):
+        self.paths = set(paths)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._contents = {path: self._read(path) for path in self.paths}
+        self._mtimes = {path: self._mtime(path) for path in self.paths}
+
+        if use_inotify is None:
+            use_inotify = Inotify.available()
+        self._inotify = None
+        if use_inotify:
+            self._inotify = Inotify()
+            for directory in {path.parent for path in self.paths}:
+                self._inotify.add_watch(directory)
+
+    @staticmethod
+    def _read(path: Path) -> bytes | None:
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _mtime(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _touched(self, timeout: float | None) -> set[Path]:
+        if self._inotify is not None:
+            return self.paths.intersection(self._inotify.read(timeout))
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            touched = set()
+            for path in self.paths:
+                mtime = self._mtime(path)
+                if mtime != self._mtimes[path]:
+                    self._mtimes[path] = mtime
+                    touched.add(path)
+            if touched:
+                return touched
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            remaining = self.poll_interval
+            if deadline is not None:
+                remaining = min(remaining, deadline - time.monotonic())
+            time.sleep(max(remaining, 0))
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        """\
+        Blocks until the contents of at least one file changed,
+        and returns the changed files.
+        Returns an empty set if nothing changed within `timeout` seconds.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+            touched = self._touched(remaining)
+            if not touched:
+                if remaining == 0:
+                    return set()
+                continue
+
+            while more := self._touched(self.debounce):
+                touched |= more
+
+            changed = set()
+            for path in touched:
+                contents = self._read(path)
+                if contents is not None and contents != self._contents[path]:
+                    self._contents[path] = contents
+                    changed.add(path)
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self) -> Watcher:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from pipfreeze2nix.artifact_cache import ArtifactCache
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def add_artifact(cache: ArtifactCache, url: str, contents: bytes) -> str:
+    sha256 = hashlib.sha256(contents).hexdigest()
+    with cache.partial_download(url) as partial_path:
+        partial_path.write_bytes(contents)
+        cache.add(url, partial_path, sha256)
+    return sha256
+
+
+def age_all(cache: ArtifactCache, seconds: float) -> None:
+    past = time.time() - seconds
+    for path in cache.objects_dir.glob("*/*"):
+        os.utime(path, (past, past))
+
+
+def test_artifact_cache__keyed_by_url(tmp_path):
+    cache = ArtifactCache(tmp_path, max_size=1024**2)
+    first = add_artifact(cache, "https://a.com/pkg-1.0.tar.gz", b"from a")
+    second = add_artifact(cache, "https://b.com/pkg-1.0.tar.gz", b"from b")
+
+    assert first != second
+    assert cache.get_sha256("https://a.com/pkg-1.0.tar.gz") == first
+    assert cache.get_sha256("https://b.com/pkg-1.0.tar.gz") == second
+    assert cache.get_sha256("https://c.com/pkg-1.0.tar.gz") is None
+    assert cache.get_path(first).read_bytes() == b"from a"
+
+
+def test_artifact_cache__no_leftover_temporary_files(tmp_path):
+    cache = ArtifactCache(tmp_path, max_size=1024**2)
+    add_artifact(cache, "https://a.com/pkg-1.0.tar.gz", b"contents")
+
+    assert list(cache.tmp_dir.iterdir()) == []
+
+
+def test_artifact_cache__measures_size_once(tmp_path, monkeypatch):
+    cache = ArtifactCache(tmp_path, max_size=2500)
+    add_artifact(cache, "https://a.com/first", b"1" * 1000)
+
+    scans = []
+    objects = cache._objects
+
+    def counting_objects():
+        scans.append(1)
+        return objects()
+
+    monkeypatch.setattr(cache, "_objects", counting_objects)
+    add_artifact(cache, "https://a.com/second", b"2" * 1000)
+    add_artifact(cache, "https://a.com/second", b"2" * 1000)
+    assert scans == []
+
+    # Going over the limit measures the cache again, to evict from it.
+    add_artifact(cache, "https://a.com/third", b"3" * 1000)
+    assert scans == [1]
+    assert cache.stats().size == 2000
+
+
+def test_artifact_cache__evicts_least_recently_used(tmp_path):
+    cache = ArtifactCache(tmp_path, max_size=2500)
+    first = add_artifact(cache, "https://a.com/first", b"1" * 1000)
+    add_artifact(cache, "https://a.com/second", b"2" * 1000)
+    age_all(cache, 100)
+    assert cache.get_sha256("https://a.com/first") == first
+
+    third = add_artifact(cache, "https://a.com/third", b"3" * 1000)
+    assert cache.get_sha256("https://a.com/first") == first
+    assert cache.get_sha256("https://a.com/second") is None
+    assert cache.get_sha256("https://a.com/third") == third
+
+
+def test_artifact_cache__stats_and_prune(tmp_path):
+    cache = ArtifactCache(tmp_path, max_size=1024**2)
+    add_artifact(cache, "https://a.com/first", b"1" * 1000)
+    add_artifact(cache, "https://a.com/second", b"2" * 1000)
+
+    stats = cache.stats()
+    assert (stats.entries, stats.size) == (2, 2000)
+
+    result = cache.prune(max_size=1000)
+    assert (result.removed_entries, result.removed_size) == (1, 1000)
+    assert cache.stats().entries == 1
+    assert len(list(cache.urls_dir.iterdir())) == 1
+
+
+def test_artifact_cache__partial_download_is_kept(tmp_path):
+    cache = ArtifactCache(tmp_path, max_size=1024**2)
+    url = "https://a.com/pkg-1.0.tar.gz"
+    with cache.partial_download(url) as partial_path:
+        partial_path.write_bytes(b"some")
+
+    with cache.partial_download(url) as resumed_path:
+        assert resumed_path == partial_path
+        with open(resumed_path, "ab") as f:
+            f.write(b" contents")
+        sha256 = hashlib.sha256(b"some contents").hexdigest()
+        cache.add(url, resumed_path, sha256)
+
+    assert cache.get_path(sha256).read_bytes() == b"some contents"
+    with cache.partial_download(url) as partial_path:
+        assert partial_path.read_bytes() == b""
@@ -0,0 +1,313 @@
+import hashlib
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from pipfreeze2nix import download
+from pipfreeze2nix.exceptions import DownloadError
+from pipfreeze2nix.timings import Recorder
+from pipfreeze2nix.transport import Transport
+
+CONTENTS = bytes(range(256)) * 4096
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """\
+    Serves CONTENTS with byte range support, unless `accept_ranges` is False,
+    dropping the connection after the number of bytes in `drop_after`
+    for as many responses as it has items.
+    """
+
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+    accept_ranges = True
+    unavailable = 0
+    drop_after: list[int] = []
+    ranges: list[tuple[str | None, str | None]] = []
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        RangeHandler.ranges.append((range_header, if_range))
+        if RangeHandler.unavailable:
+            RangeHandler.unavailable -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, len(CONTENTS) - 1
+        if (
+            RangeHandler.accept_ranges
+            and range_header is not None
+            and if_range in (None, RangeHandler.etag)
+        ):
+            first, _, last = range_header.removeprefix("bytes=").partition("-")
+            start, end = int(first), int(last or end)
+        if start >= len(CONTENTS):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(CONTENTS)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = CONTENTS[start : end + 1]
+        if len(body) < len(CONTENTS):
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENTS)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", RangeHandler.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if RangeHandler.drop_after:
+            self.wfile.write(body[: RangeHandler.drop_after.pop(0)])
+            self.wfile.flush()
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/somepackage-1.0.tar.gz"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_handler():
+    RangeHandler.etag = '"v1"'
+    RangeHandler.accept_ranges = True
+    RangeHandler.unavailable = 0
+    RangeHandler.drop_after = []
+    RangeHandler.ranges = []
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+SHA256 = hashlib.sha256(CONTENTS).hexdigest()
+
+
+def received(drop_after: int) -> int:
+    """\
+    The bytes kept from a response dropped after `drop_after` bytes,
+    since the chunk being read when the connection drops is lost.
+    """
+
+    return drop_after // download.CHUNK_SIZE * download.CHUNK_SIZE
+
+
+def test_fetch_artifact__resumes_interrupted_transfer(server_url, tmp_path):
+    RangeHandler.drop_after = [200000, 300000]
+    recorder = Recorder(enabled=True)
+    partial_path = tmp_path / "artifact.part"
+    sha256 = download.fetch_artifact(
+        server_url, partial_path, Transport(backoff_factor=0), recorder
+    )
+
+    assert sha256 == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+    assert not download.validator_path(partial_path).exists()
+    assert RangeHandler.ranges == [
+        (None, None),
+        (f"bytes={received(200000)}-", '"v1"'),
+        (f"bytes={received(200000) + received(300000)}-", '"v1"'),
+    ]
+    assert recorder.counters()["download_resumed"] == 2
+    assert recorder.counters()["bytes_downloaded"] == len(CONTENTS)
+
+
+def test_fetch_artifact__resumes_without_cache_path(server_url):
+    RangeHandler.drop_after = [200000]
+    sha256 = download.fetch_artifact(server_url, None, Transport(backoff_factor=0))
+    assert sha256 == SHA256
+
+
+def test_fetch_artifact__gives_up_after_retries(server_url, tmp_path):
+    RangeHandler.drop_after = [200000, 200000, 200000]
+    transport = Transport(retries=1, backoff_factor=0)
+    with pytest.raises(download.INTERRUPTED_ERRORS):
+        download.fetch_artifact(server_url, tmp_path / "artifact.part", transport)
+    assert len(RangeHandler.ranges) == 2
+    assert transport.stats().retries == 1
+
+    # What was downloaded is kept for the next attempt.
+    assert (tmp_path / "artifact.part").read_bytes() == CONTENTS[: 2 * received(200000)]
+
+
+def test_fetch_artifact__one_retry_budget(server_url, tmp_path):
+    # An unavailable server and an interrupted transfer take from the same retries,
+    # rather than every attempt being retried again by the transport.
+    RangeHandler.unavailable = 1
+    RangeHandler.drop_after = [200000, 200000]
+    transport = Transport(retries=2, backoff_factor=0)
+    with pytest.raises(download.INTERRUPTED_ERRORS):
+        download.fetch_artifact(server_url, tmp_path / "artifact.part", transport)
+    assert len(RangeHandler.ranges) == 3
+    assert transport.stats().retries == 2
+
+
+def test_fetch_artifact__resumes_earlier_partial(server_url, tmp_path):
+    partial_path = tmp_path / "artifact.part"
+    partial_path.write_bytes(CONTENTS[:1000])
+    download.validator_path(partial_path).write_text('"v1"')
+
+    recorder = Recorder(enabled=True)
+    sha256 = download.fetch_artifact(server_url, partial_path, recorder=recorder)
+    assert sha256 == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+    assert RangeHandler.ranges == [("bytes=1000-", '"v1"')]
+    assert recorder.counters()["bytes_downloaded"] == len(CONTENTS) - 1000
+
+
+def test_fetch_artifact__restarts_changed_file(server_url, tmp_path):
+    partial_path = tmp_path / "artifact.part"
+    partial_path.write_bytes(b"x" * 1000)
+    download.validator_path(partial_path).write_text('"v0"')
+
+    sha256 = download.fetch_artifact(server_url, partial_path)
+    assert sha256 == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+
+
+def test_fetch_artifact__restarts_partial_without_validator(server_url, tmp_path):
+    partial_path = tmp_path / "artifact.part"
+    partial_path.write_bytes(b"x" * 1000)
+
+    sha256 = download.fetch_artifact(server_url, partial_path)
+    assert sha256 == SHA256
+    assert RangeHandler.ranges == [(None, None)]
+
+
+def test_fetch_artifact__restarts_past_the_end(server_url, tmp_path):
+    partial_path = tmp_path / "artifact.part"
+    partial_path.write_bytes(CONTENTS + b"x")
+    download.validator_path(partial_path).write_text('"v1"')
+
+    sha256 = download.fetch_artifact(server_url, partial_path)
+    assert sha256 == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+
+
+def test_fetch_artifact__checks_expected_size(server_url, tmp_path):
+    partial_path = tmp_path / "artifact.part"
+    with pytest.raises(DownloadError):
+        download.fetch_artifact(
+            server_url, partial_path, expected_size=len(CONTENTS) + 1
+        )
+    assert not partial_path.exists()
+
+
+@pytest.fixture
+def part_size(monkeypatch):
+    monkeypatch.setattr(download, "PART_SIZE", 100000)
+    return 100000
+
+
+def fetch_segmented(server_url, partial_path, recorder=None):
+    return download.fetch_artifact(
+        server_url,
+        partial_path,
+        Transport(backoff_factor=0),
+        recorder,
+        expected_size=len(CONTENTS),
+        segments=3,
+        segment_threshold=len(CONTENTS),
+    )
+
+
+def test_fetch_artifact__segmented(server_url, tmp_path, part_size):
+    recorder = Recorder(enabled=True)
+    partial_path = tmp_path / "artifact.part"
+    assert fetch_segmented(server_url, partial_path, recorder) == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+
+    assert sorted(
+        (int(first), int(last))
+        for range_header, _ in RangeHandler.ranges
+        for first, last in [range_header.removeprefix("bytes=").split("-")]
+    ) == [
+        (start, min(start + part_size, len(CONTENTS)) - 1)
+        for start in range(0, len(CONTENTS), part_size)
+    ]
+    assert recorder.counters()["download_segmented"] == 1
+    assert recorder.counters()["bytes_downloaded"] == len(CONTENTS)
+
+
+def test_fetch_artifact__segmented_resumes_interrupted_part(
+    server_url, tmp_path, part_size
+):
+    RangeHandler.drop_after = [70000]
+    partial_path = tmp_path / "artifact.part"
+    assert fetch_segmented(server_url, partial_path) == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+
+
+def test_fetch_artifact__segmented_without_cache_path(server_url, part_size):
+    assert fetch_segmented(server_url, None) == SHA256
+
+
+def test_fetch_artifact__segmented_below_threshold(server_url, tmp_path, part_size):
+    download.fetch_artifact(
+        server_url,
+        tmp_path / "artifact.part",
+        expected_size=len(CONTENTS),
+        segments=3,
+        segment_threshold=len(CONTENTS) + 1,
+    )
+    assert RangeHandler.ranges == [(None, None)]
+
+
+def test_fetch_artifact__segmented_falls_back_to_stream(
+    server_url, tmp_path, part_size
+):
+    RangeHandler.accept_ranges = False
+    recorder = Recorder(enabled=True)
+    partial_path = tmp_path / "artifact.part"
+    assert fetch_segmented(server_url, partial_path, recorder) == SHA256
+    assert partial_path.read_bytes() == CONTENTS
+    assert RangeHandler.ranges[-1] == (None, None)
+    assert recorder.counters()["download_segmented"] == 0
+
+
+def test_fetch_artifact__segmented_checks_file_did_not_change(
+    server_url, tmp_path, part_size, monkeypatch
+):
+    responses = 0
+    send_header = RangeHandler.send_header
+
+    def changing_etag(self, keyword, value):
+        nonlocal responses
+        if keyword == "ETag":
+            responses += 1
+            value = f'"v{responses}"'
+        send_header(self, keyword, value)
+
+    monkeypatch.setattr(RangeHandler, "send_header", changing_etag)
+    with pytest.raises(DownloadError):
+        fetch_segmented(server_url, tmp_path / "artifact.part")
+
+
+def test_parse_content_range():
+    assert download.parse_content_range("bytes 10-19/20") == (10, 20)
+    assert download.parse_content_range("bytes 10-19/*") == (10, None)
+    assert download.parse_content_range("bytes */20") is None
+    assert download.parse_content_range(None) is None
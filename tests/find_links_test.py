@@ -0,0 +1,125 @@
+import hashlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+from packaging.version import Version
+
+from pipfreeze2nix import find_links
+from pipfreeze2nix.resolution_store import ResolutionStore
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def test_find_links__indexes_by_name_and_version(tmp_path):
+    for filename in [
+        "Some_Package-1.0-py3-none-any.whl",
+        "some-package-1.0.tar.gz",
+        "some_package-2.0-py3-none-any.whl",
+        "not-an-artifact.txt",
+        "broken.whl",
+    ]:
+        (tmp_path / filename).write_bytes(b"")
+
+    local = find_links.FindLinks([tmp_path])
+    artifacts = local.get_artifacts("some.package", Version("1.0"))
+    assert [artifact.name for artifact in artifacts] == [
+        "Some_Package-1.0-py3-none-any.whl",
+        "some-package-1.0.tar.gz",
+    ]
+    assert artifacts[0].url == (tmp_path / artifacts[0].name).resolve().as_uri()
+    assert artifacts[0].hashes == {}
+    assert local.get_artifacts("some-package", Version("3.0")) == []
+    assert local.get_artifacts("other", Version("1.0")) == []
+
+
+def test_file_sha256(tmp_path):
+    (tmp_path / "artifact.whl").write_bytes(b"contents")
+    (tmp_path / "empty.whl").write_bytes(b"")
+    assert (
+        find_links.file_sha256(tmp_path / "artifact.whl")
+        == hashlib.sha256(b"contents").hexdigest()
+    )
+    assert (
+        find_links.file_sha256(tmp_path / "empty.whl")
+        == hashlib.sha256(b"").hexdigest()
+    )
+
+
+@pytest.fixture
+def counted_file_sha256(monkeypatch):
+    hashed = []
+
+    def file_sha256(path):
+        hashed.append(path.name)
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+
+    monkeypatch.setattr(find_links, "file_sha256", file_sha256)
+    return hashed
+
+
+def test_file_hasher__remembers_unchanged_files(tmp_path, counted_file_sha256):
+    path = tmp_path / "artifact.whl"
+    path.write_bytes(b"contents")
+    store = ResolutionStore(tmp_path / "resolutions.sqlite3")
+
+    hasher = find_links.FileHasher(store)
+    assert hasher.sha256(path) == hashlib.sha256(b"contents").hexdigest()
+    assert hasher.sha256(path) == hashlib.sha256(b"contents").hexdigest()
+    assert find_links.FileHasher(store).sha256(path) == hasher.sha256(path)
+    assert counted_file_sha256 == ["artifact.whl"]
+
+    path.write_bytes(b"new contents")
+    assert (
+        find_links.FileHasher(store).sha256(path)
+        == hashlib.sha256(b"new contents").hexdigest()
+    )
+    assert counted_file_sha256 == ["artifact.whl", "artifact.whl"]
+
+
+def test_file_hasher__process_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(find_links, "PROCESS_POOL_MIN_SIZE", 1)
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"artifact-{i}.whl")
+        paths[-1].write_bytes(str(i).encode())
+
+    hasher = find_links.FileHasher(processes=2)
+    try:
+        digests = [hasher.sha256(path) for path in paths]
+    finally:
+        hasher.close()
+    assert digests == [hashlib.sha256(str(i).encode()).hexdigest() for i in range(3)]
+
+
+def test_file_url_path(tmp_path):
+    path = tmp_path / "some package-1.0.tar.gz"
+    assert find_links.file_url_path(path.as_uri()) == path
+
+
+def test_parse_url_prefix(tmp_path):
+    assert find_links.parse_url_prefix(f"{tmp_path}=https://wheels.example.com") == (
+        tmp_path.resolve().as_uri() + "/",
+        "https://wheels.example.com/",
+    )
+    assert find_links.parse_url_prefix(
+        "https://pypi.example.com/files/=https://mirror.example.com/"
+    ) == ("https://pypi.example.com/files/", "https://mirror.example.com/")
+    with pytest.raises(ValueError):
+        find_links.parse_url_prefix("https://pypi.example.com/")
+
+
+def test_map_url():
+    url_prefixes = [("file:///mnt/wheels/", "https://wheels.example.com/")]
+    assert (
+        find_links.map_url("file:///mnt/wheels/a-1.0.tar.gz", url_prefixes)
+        == "https://wheels.example.com/a-1.0.tar.gz"
+    )
+    assert (
+        find_links.map_url("file:///mnt/wheels2/a-1.0.tar.gz", url_prefixes)
+        == "file:///mnt/wheels2/a-1.0.tar.gz"
+    )
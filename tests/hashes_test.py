@@ -0,0 +1,50 @@
+import hashlib
+
+from pipfreeze2nix import hashes
+
+SHA256 = hashlib.sha256(b"contents").hexdigest()
+SHA512 = hashlib.sha512(b"contents").hexdigest()
+
+
+def test_parse_hash_fragment():
+    assert hashes.parse_hash_fragment(f"sha256={SHA256}") == {"sha256": SHA256}
+    assert hashes.parse_hash_fragment("SHA512=abc") == {"sha512": "abc"}
+    assert hashes.parse_hash_fragment("md5=abc") == {"md5": "abc"}
+    assert hashes.parse_hash_fragment("") == {}
+    assert hashes.parse_hash_fragment("nodigest") == {}
+
+
+def test_to_sri():
+    assert hashes.to_sri("sha256", SHA256) == (
+        "sha256-0bKln76n4gB3r5+Rsn6V6GUGGycL4D/1Oas7c1h4gug="
+    )
+
+
+def test_best_sri__prefers_strongest():
+    assert hashes.best_sri({"sha256": SHA256, "sha512": SHA512}) == hashes.to_sri(
+        "sha512", SHA512
+    )
+    assert hashes.best_sri({"sha256": SHA256, "md5": "abc"}) == hashes.to_sri(
+        "sha256", SHA256
+    )
+
+
+def test_best_sri__skips_unusable_digests():
+    assert hashes.best_sri({}) is None
+    assert hashes.best_sri({"md5": hashlib.md5(b"contents").hexdigest()}) is None
+    assert hashes.best_sri({"sha512": "not hex", "sha256": SHA256}) == (
+        hashes.to_sri("sha256", SHA256)
+    )
+
+
+def test_best_sri__skips_truncated_digests():
+    assert hashes.best_sri(hashes.parse_hash_fragment("sha256=ab")) is None
+    assert hashes.best_sri({"sha512": SHA512[:-2], "sha256": SHA256}) == (
+        hashes.to_sri("sha256", SHA256)
+    )
+    assert hashes.best_sri({"sha256": SHA256 + "00"}) is None
+
+
+def test_normalize_hash():
+    assert hashes.normalize_hash(SHA256) == hashes.to_sri("sha256", SHA256)
+    assert hashes.normalize_hash("sha512-abc=") == "sha512-abc="
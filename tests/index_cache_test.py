@@ -0,0 +1,240 @@
+import gzip
+import os
+import time
+from dataclasses import replace
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+from packaging.version import Version
+
+from pipfreeze2nix import pep503
+from pipfreeze2nix.exceptions import OfflineCacheMissError
+from pipfreeze2nix.index_cache import CachedPage
+from pipfreeze2nix.index_cache import IndexCache
+
+INDEX_URL = "https://packagestore.com/simple/"
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def make_page(etag: str | None = '"v1"', age: float = 0) -> CachedPage:
+    return CachedPage(
+        etag=etag,
+        last_modified=None,
+        fetched_at=time.time() - age,
+        content_type="text/html",
+    )
+
+
+def anchor(filename: str) -> bytes:
+    return f'<a href="{filename}">{filename}</a>'.encode()
+
+
+def read_body(cache: IndexCache, project: str) -> bytes:
+    with cache.open_body(cache.get(INDEX_URL, project)) as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {"Content-Type": "text/html"}
+        self.encoding = None
+        self.closed = False
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise AssertionError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), 5):
+            yield self.content[start : start + 5]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeTransport:
+    def __init__(self, get):
+        self.get = get
+
+
+def test_index_cache__roundtrip(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    page = make_page()
+    cache.put(INDEX_URL, "Some_Package", page, b"<html></html>")
+
+    assert replace(cache.get(INDEX_URL, "some-package"), body=None) == page
+    assert read_body(cache, "some-package") == b"<html></html>"
+    assert cache.get("https://other.com/simple/", "some-package") is None
+    assert cache.open_body(page) is None
+
+
+def test_index_cache__compressed(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    cache.put(INDEX_URL, "somepackage", make_page(), b"<a>x</a>" * 10000)
+
+    (body_path,) = tmp_path.glob("*.gz")
+    assert body_path.stat().st_size < 10000
+    assert b"<a>x</a>" in gzip.decompress(body_path.read_bytes())
+
+
+def test_index_cache__removes_pages_in_old_format(tmp_path):
+    (tmp_path / "0123.json.gz").write_bytes(gzip.compress(b'{"body": ""}'))
+    (tmp_path / "4567.gz").write_bytes(gzip.compress(b"<html></html>"))
+    IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_index_cache__page_changes_when_its_cached_page_is_replaced(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    cache.put(INDEX_URL, "somepackage", make_page(etag='"v1"'), b"first")
+    old_page = cache.get(INDEX_URL, "somepackage")
+
+    with cache.writer(INDEX_URL, "somepackage", make_page(etag='"v2"')) as f:
+        f.write(b"second")
+        f.flush()
+        # Until the new CachedPage is written, readers see the old page whole.
+        assert cache.get(INDEX_URL, "somepackage") == old_page
+        assert read_body(cache, "somepackage") == b"first"
+
+    assert cache.get(INDEX_URL, "somepackage").etag == '"v2"'
+    assert read_body(cache, "somepackage") == b"second"
+    # The body that was replaced is removed once no page names it.
+    assert cache.open_body(old_page) is None
+    assert len(list(tmp_path.glob("*.gz"))) == 1
+
+
+def test_index_cache__writer_discards_failed_page(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    with pytest.raises(ValueError):
+        with cache.writer(INDEX_URL, "somepackage", make_page()) as f:
+            f.write(b"<a>partial")
+            raise ValueError("interrupted")
+
+    assert cache.get(INDEX_URL, "somepackage") is None
+    assert list(tmp_path.iterdir()) == []
+
+    cache.put(INDEX_URL, "somepackage", make_page(), b"complete")
+    with pytest.raises(ValueError):
+        with cache.writer(INDEX_URL, "somepackage", make_page(etag='"v2"')) as f:
+            f.write(b"<a>partial")
+            raise ValueError("interrupted")
+
+    assert cache.get(INDEX_URL, "somepackage").etag == '"v1"'
+    assert read_body(cache, "somepackage") == b"complete"
+
+
+def test_index_cache__evicts_least_recently_used(tmp_path):
+    body = os.urandom(2048)
+    cache = IndexCache(tmp_path, ttl=60, max_size=5000)
+    cache.put(INDEX_URL, "first", make_page(), body)
+    cache.put(INDEX_URL, "second", make_page(), body)
+
+    second = cache.get(INDEX_URL, "second")
+
+    past = time.time() - 100
+    for path in tmp_path.iterdir():
+        os.utime(path, (past, past))
+    assert cache.get(INDEX_URL, "first") is not None
+
+    cache.put(INDEX_URL, "third", make_page(), body)
+    assert cache.get(INDEX_URL, "first") is not None
+    assert cache.get(INDEX_URL, "second") is None
+    assert cache.open_body(second) is None
+    assert cache.get(INDEX_URL, "third") is not None
+
+
+def test_find_artifacts__fresh_entry_skips_network(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    cache.put(INDEX_URL, "somepackage", make_page(), anchor("somepackage-1.0.tar.gz"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("should not hit the network")
+
+    (artifact,) = pep503.find_artifacts(
+        "somepackage", cache, FakeTransport(fail), index_url=INDEX_URL
+    )
+    assert artifact.name == "somepackage-1.0.tar.gz"
+
+
+def test_find_artifacts__filters_cached_page(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    body = anchor("somepackage-1.0.tar.gz") + anchor("somepackage-1.1.tar.gz")
+    cache.put(INDEX_URL, "somepackage", make_page(), body)
+
+    (artifact,) = pep503.find_artifacts(
+        "somepackage", cache, index_url=INDEX_URL, version=Version("1.1")
+    )
+    assert artifact.name == "somepackage-1.1.tar.gz"
+    assert (
+        pep503.find_artifacts(
+            "somepackage", cache, index_url=INDEX_URL, version=Version("2.0")
+        )
+        == []
+    )
+
+
+def test_find_artifacts__revalidates_stale_entry(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    cache.put(
+        INDEX_URL, "somepackage", make_page(age=120), anchor("somepackage-1.0.tar.gz")
+    )
+
+    seen_headers = []
+
+    def not_modified(url, headers, stream):
+        seen_headers.append(headers)
+        return FakeResponse(304)
+
+    transport = FakeTransport(not_modified)
+    (artifact,) = pep503.find_artifacts(
+        "somepackage", cache, transport, index_url=INDEX_URL
+    )
+    assert artifact.name == "somepackage-1.0.tar.gz"
+    assert seen_headers[0]["If-None-Match"] == '"v1"'
+    assert cache.get(INDEX_URL, "somepackage").is_fresh(60)
+
+
+def test_find_artifacts__stores_new_page_while_parsing(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    body = anchor("somepackage-1.0.tar.gz") + anchor("somepackage-1.1.tar.gz")
+    response = FakeResponse(200, body, {"Content-Type": "text/html", "ETag": '"v2"'})
+    transport = FakeTransport(lambda url, headers, stream: response)
+
+    (artifact,) = pep503.find_artifacts(
+        "somepackage", cache, transport, index_url=INDEX_URL, version=Version("1.1")
+    )
+    assert artifact.name == "somepackage-1.1.tar.gz"
+    assert response.closed
+    assert cache.get(INDEX_URL, "somepackage").etag == '"v2"'
+    # The whole page is cached, not just the artifacts of the version asked for.
+    assert read_body(cache, "somepackage") == body
+
+
+def test_find_artifacts__not_found(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2)
+    transport = FakeTransport(lambda url, headers, stream: FakeResponse(404))
+
+    for _ in range(2):
+        assert (
+            pep503.find_artifacts("somepackage", cache, transport, index_url=INDEX_URL)
+            is None
+        )
+    assert cache.get(INDEX_URL, "somepackage").not_found
+
+
+def test_find_artifacts__offline(tmp_path):
+    cache = IndexCache(tmp_path, ttl=60, max_size=1024**2, offline=True)
+    cache.put(INDEX_URL, "stale", make_page(age=10**6), anchor("stale-1.0.tar.gz"))
+
+    (artifact,) = pep503.find_artifacts("stale", cache, index_url=INDEX_URL)
+    assert artifact.name == "stale-1.0.tar.gz"
+    with pytest.raises(OfflineCacheMissError):
+        pep503.find_artifacts("missing", cache, index_url=INDEX_URL)
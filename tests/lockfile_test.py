@@ -0,0 +1,163 @@
+import json
+import textwrap
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+from packaging.version import Version
+
+from pipfreeze2nix import lockfile
+
+CONTEXT = {
+    "source": "https://pypi.org/simple/",
+    "url_prefixes": [],
+    "platforms": {"x86_64-linux": "x86_64-linux-cp310-0123456789abcdef"},
+}
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def test_read_locked_artifacts(tmp_path):
+    # requests was written by a version before SRI hashes.
+    (tmp_path / "requirements.nix").write_text(
+        lockfile.render_context(CONTEXT)
+        + textwrap.dedent(
+            """\
+        { python, nixpkgs }:
+        let
+          Charset_Normalizer = (python.pkgs.buildPythonPackage rec {
+            pname = "Charset_Normalizer";
+            version = "2.1.1";
+            format = "wheel";
+
+            doCheck = false;
+
+            propagatedBuildInputs = [
+
+            ];
+
+            src = nixpkgs.fetchurl {
+              url = "https://example.com/charset_normalizer-2.1.1-py3-none-any.whl";
+              hash = "sha512-83e9a75d";
+            };
+          });
+          requests = (python.pkgs.buildPythonPackage rec {
+            pname = "requests";
+            version = "2.28.1";
+            format = "setuptools";
+
+            doCheck = false;
+
+            propagatedBuildInputs = [
+              Charset_Normalizer
+            ];
+
+            src = builtins.fetchurl {
+              url = "https://example.com/requests-2.28.1.tar.gz";
+              sha256 = "ec72420df5dfbdce4111f715c96338df3b7cb75f58e478d2449c9720e560de8c";
+            };
+          });
+        in
+        [
+          requests
+        ]
+        """
+        )
+    )
+
+    assert lockfile.read_locked_artifacts(tmp_path / "requirements.nix", CONTEXT) == {
+        ("charset-normalizer", "2.1.1"): lockfile.LockedArtifact(
+            url="https://example.com/charset_normalizer-2.1.1-py3-none-any.whl",
+            hash="sha512-83e9a75d",
+            artifact_format="wheel",
+        ),
+        ("requests", "2.28.1"): lockfile.LockedArtifact(
+            url="https://example.com/requests-2.28.1.tar.gz",
+            hash="sha256-7HJCDfXfvc5BEfcVyWM43zt8t19Y5HjSRJyXIOVg3ow=",
+            artifact_format="setuptools",
+        ),
+    }
+
+    other_context = {**CONTEXT, "url_prefixes": [["https://a/", "https://b/"]]}
+    assert (
+        lockfile.read_locked_artifacts(tmp_path / "requirements.nix", other_context)
+        == {}
+    )
+
+
+def test_read_locked_artifacts__missing_file(tmp_path):
+    assert lockfile.read_locked_artifacts(tmp_path / "requirements.nix", CONTEXT) == {}
+
+
+def test_read_locked_artifacts__without_context(tmp_path):
+    nix_file = tmp_path / "requirements.nix"
+    nix_file.write_text(
+        'pname = "idna"; version = "3.4"; format = "wheel"; '
+        'src = nixpkgs.fetchurl { url = "https://example.com/idna.whl"; hash = "sha256-AAAA"; };'
+    )
+    assert lockfile.read_locked_artifacts(nix_file, CONTEXT) == {}
+
+
+def test_lock_key__normalizes():
+    assert lockfile.lock_key("Zope.Interface", Version("5.4")) == (
+        "zope-interface",
+        "5.4",
+    )
+
+
+def test_read_json_locked_artifacts(tmp_path):
+    lock_file = tmp_path / "requirements.lock.json"
+    lock_file.write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "context": CONTEXT,
+                "packages": [
+                    {
+                        "name": "Charset_Normalizer",
+                        "version": "2.1.1",
+                        "dependencies": [],
+                        "format": "wheel",
+                        "url": "https://example.com/charset_normalizer.whl",
+                        "hash": "sha256-g+mnXRkRJ5r9iTUsaLRTSFWdH8BQawVLNGZRtef+4p8=",
+                    },
+                    {
+                        "name": "numpy",
+                        "version": "1.24.0",
+                        "dependencies": [],
+                        "systems": {
+                            "x86_64-linux": {
+                                "format": "wheel",
+                                "url": "https://example.com/numpy.whl",
+                                "hash": "sha256-AAAA",
+                            }
+                        },
+                    },
+                ],
+                "direct": ["numpy"],
+            }
+        )
+    )
+
+    assert lockfile.read_json_locked_artifacts(lock_file, CONTEXT) == {
+        ("charset-normalizer", "2.1.1"): lockfile.LockedArtifact(
+            url="https://example.com/charset_normalizer.whl",
+            hash="sha256-g+mnXRkRJ5r9iTUsaLRTSFWdH8BQawVLNGZRtef+4p8=",
+            artifact_format="wheel",
+        ),
+    }
+    other_context = {**CONTEXT, "source": "https://mirror.example.com/simple/"}
+    assert lockfile.read_json_locked_artifacts(lock_file, other_context) == {}
+
+
+def test_read_json_locked_artifacts__missing_or_malformed(tmp_path):
+    lock_file = tmp_path / "requirements.lock.json"
+    assert lockfile.read_json_locked_artifacts(lock_file, CONTEXT) == {}
+    lock_file.write_text("{ python, nixpkgs }:")
+    assert lockfile.read_json_locked_artifacts(lock_file, CONTEXT) == {}
+    lock_file.write_text('{"version": 1, "packages": []}')
+    assert lockfile.read_json_locked_artifacts(lock_file, CONTEXT) == {}
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+from packaging.version import Version
+
+from pipfreeze2nix.nixpkgs_index import nix_attr
+from pipfreeze2nix.nixpkgs_index import NixpkgsIndex
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def test_nixpkgs_index__exact_version(tmp_path):
+    path = tmp_path / "nixpkgs.json"
+    path.write_text(
+        json.dumps(
+            {
+                "requests": "2.28.1",
+                "charset-normalizer": "2.1.1",
+                "zope_interface": "5.4.0",
+                "pytest": "7.2.0",
+                "callPackage": None,
+                "somepackage": "unstable-2022-12-01",
+            }
+        )
+    )
+    index = NixpkgsIndex.load(path)
+
+    assert index.get("requests", Version("2.28.1")) == "requests"
+    assert index.get("requests", Version("2.28.2")) is None
+    assert index.get("Charset_Normalizer", Version("2.1.1")) == "charset-normalizer"
+    assert index.get("zope.interface", Version("5.4")) == "zope_interface"
+    assert index.get("somepackage", Version("2022.12.1")) is None
+    assert index.get("attrs", Version("22.1.0")) is None
+    assert len(index) == 4
+
+
+def test_nixpkgs_index__prefers_normalized_attr():
+    index = NixpkgsIndex({"PyYAML": "6.0", "pyyaml": "6.0", "Zope.Event": "4.5"})
+    assert index.get("pyyaml", Version("6.0")) == "pyyaml"
+    assert index.get("zope-event", Version("4.5")) == "Zope.Event"
+
+
+def test_nixpkgs_index__rejects_non_object(tmp_path):
+    path = tmp_path / "nixpkgs.json"
+    path.write_text("[]")
+    with pytest.raises(ValueError):
+        NixpkgsIndex.load(path)
+
+
+def test_nix_attr():
+    assert nix_attr("zope-interface") == "zope-interface"
+    assert nix_attr("Zope.Event") == '"Zope.Event"'
+    assert nix_attr("3to2") == '"3to2"'
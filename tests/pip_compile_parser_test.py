@@ -6,6 +6,8 @@ import pytest
 from packaging.requirements import Requirement
 
 from pipfreeze2nix import pip_compile_parser
+from pipfreeze2nix.exceptions import DependencyCycleError
+from pipfreeze2nix.exceptions import PipCompileInvariantError
 
 
 @pytest.fixture
@@ -262,3 +264,148 @@ def test_sorted_reverse_topological(tmp_path):
             dependencies=frozenset(),
         ),
     ]
+
+
+def test_parse_compiled_lines__options_and_hashes():
+    lines = textwrap.dedent(
+        """\
+        --index-url https://pypi.org/simple/
+        --extra-index-url https://private.example.com/simple/
+        --trusted-host private.example.com
+
+        idna==3.4 \\
+            --hash=sha256:814f528e8dead7d329833b91c5faa87d60bf71824cd12a7530b5526063d02cb4 \\
+            --hash=sha256:90b77e79eaa3eba6de819a0c442c0b4ceefc341a7a2ab77d7562bf49f425c5c2
+            # via requests
+        requests==2.28.1 \\
+            --hash=sha256:7c5599b102feddaa661c826c56ab4fee28bfd17f5abca1ebbe3e7f19d7c97983
+            # via -r requirements.in
+        """
+    ).splitlines()
+
+    assert pip_compile_parser.parse_compiled_lines(lines) == [
+        pip_compile_parser.RequirementTree(
+            req=Requirement("idna==3.4"),
+            is_direct=False,
+            dependencies=frozenset(),
+        ),
+        pip_compile_parser.RequirementTree(
+            req=Requirement("requests==2.28.1"),
+            is_direct=True,
+            dependencies=frozenset({"idna"}),
+        ),
+    ]
+
+
+def test_parse_compiled_lines__matches_segmented_parse(requirements_txt):
+    lines = requirements_txt.read_text().splitlines()
+    segments = pip_compile_parser.segment_compiled_requirements(lines)
+    inverse_trees = [pip_compile_parser.parse_segment(s) for s in segments]
+
+    requirement_trees = pip_compile_parser.parse_compiled_lines(iter(lines))
+    assert [tree.req for tree in requirement_trees] == [
+        inverse_tree.req for inverse_tree in inverse_trees
+    ]
+    assert [tree.is_direct for tree in requirement_trees] == [
+        inverse_tree.is_direct for inverse_tree in inverse_trees
+    ]
+
+
+def test_parse_compiled_lines__requires_annotations():
+    with pytest.raises(PipCompileInvariantError):
+        pip_compile_parser.parse_compiled_lines(["idna==3.4", "requests==2.28.1"])
+
+
+def tree(name: str, *dependencies: str) -> pip_compile_parser.RequirementTree:
+    return pip_compile_parser.RequirementTree(
+        req=Requirement(f"{name}==1.0"),
+        is_direct=False,
+        dependencies=frozenset(dependencies),
+    )
+
+
+def test_sorted_reverse_topological__cycle_raises():
+    requirement_trees = [
+        tree("sphinx", "sphinxcontrib-applehelp", "docutils"),
+        tree("sphinxcontrib-applehelp", "sphinx"),
+        tree("docutils"),
+    ]
+    with pytest.raises(
+        DependencyCycleError, match="sphinx <-> sphinxcontrib-applehelp"
+    ):
+        pip_compile_parser.sorted_reverse_topological(requirement_trees)
+
+
+def test_sorted_reverse_topological__break_cycles():
+    requirement_trees = [
+        tree("app", "sphinx"),
+        tree("sphinx", "sphinxcontrib-devhelp", "sphinxcontrib-applehelp", "docutils"),
+        tree("sphinxcontrib-applehelp", "sphinx"),
+        tree("sphinxcontrib-devhelp", "sphinx"),
+        tree("docutils"),
+    ]
+    sorted_requirement_trees = pip_compile_parser.sorted_reverse_topological(
+        requirement_trees, break_cycles=True
+    )
+    assert sorted_requirement_trees == [
+        tree("docutils"),
+        tree("sphinx", "docutils"),
+        tree("sphinxcontrib-applehelp"),
+        tree("sphinxcontrib-devhelp"),
+        tree("app", "sphinx"),
+    ]
+
+
+def test_sorted_reverse_topological__large_graph():
+    count = 10_000
+    requirement_trees = [
+        tree(f"p{i}", *(f"p{j}" for j in (i * 2 + 1, i * 2 + 2) if j < count))
+        for i in range(count)
+    ]
+    sorted_requirement_trees = pip_compile_parser.sorted_reverse_topological(
+        requirement_trees
+    )
+
+    assert len(sorted_requirement_trees) == count
+    position = {
+        requirement_tree.req.name: i
+        for i, requirement_tree in enumerate(sorted_requirement_trees)
+    }
+    for requirement_tree in requirement_trees:
+        for dependency in requirement_tree.dependencies:
+            assert position[dependency] < position[requirement_tree.req.name]
+
+
+def test_parse_index_options():
+    lines = textwrap.dedent(
+        """\
+        #
+        # This file is autogenerated by pip-compile with Python 3.10
+        #
+        --index-url https://private.example.com/simple
+        --extra-index-url=https://mirror.example.com/simple
+        --extra-index-url https://other.example.com/simple?token=a=b
+        --trusted-host private.example.com
+
+        requests==2.28.1
+            # via -r requirements.in
+        """
+    ).splitlines()
+    assert pip_compile_parser.parse_index_options(lines) == (
+        pip_compile_parser.IndexOptions(
+            index_url="https://private.example.com/simple",
+            extra_index_urls=(
+                "https://mirror.example.com/simple",
+                "https://other.example.com/simple?token=a=b",
+            ),
+        )
+    )
+
+
+def test_parse_index_options__none():
+    assert (
+        pip_compile_parser.parse_index_options(
+            ["requests==2.28.1", "    # via -r requirements.in"]
+        )
+        == pip_compile_parser.IndexOptions()
+    )
@@ -0,0 +1,56 @@
+import sys
+
+import pytest
+from packaging.tags import Tag
+
+from pipfreeze2nix import platforms
+
+
+def test_rank_tags__keeps_first_priority():
+    tags = [Tag("py3", "none", "any"), Tag("py2", "none", "any")]
+    assert platforms.rank_tags(tags + tags) == {tags[0]: 0, tags[1]: 1}
+
+
+def test_system_tag_priorities__linux():
+    priorities = platforms.system_tag_priorities("x86_64-linux", (3, 10))
+    manylinux_2_17 = priorities[Tag("cp310", "cp310", "manylinux_2_17_x86_64")]
+    manylinux2014 = priorities[Tag("cp310", "cp310", "manylinux2014_x86_64")]
+    pure = priorities[Tag("py3", "none", "any")]
+
+    assert manylinux_2_17 < manylinux2014 < pure
+    assert Tag("cp311", "cp311", "manylinux_2_17_x86_64") not in priorities
+    assert Tag("cp310", "cp310", "manylinux_2_17_aarch64") not in priorities
+    assert Tag("cp310", "cp310", "manylinux2010_aarch64") not in priorities
+
+
+def test_system_tag_priorities__darwin():
+    priorities = platforms.system_tag_priorities("aarch64-darwin", (3, 11))
+    assert Tag("cp311", "cp311", "macosx_11_0_arm64") in priorities
+    assert Tag("cp311", "cp311", "macosx_10_9_universal2") in priorities
+    assert Tag("cp311", "cp311", "macosx_11_0_x86_64") not in priorities
+
+
+def test_system_platforms__unknown_system():
+    with pytest.raises(ValueError):
+        platforms.system_platforms("riscv64-linux")
+
+
+def test_tags_key__depends_on_interpreter_and_ranking():
+    cpython = [Tag("cp310", "cp310", "linux_x86_64"), Tag("py3", "none", "any")]
+    pypy = [Tag("pp39", "pypy39_pp73", "linux_x86_64"), Tag("py3", "none", "any")]
+
+    assert platforms.tags_key(platforms.rank_tags(cpython)).startswith("cp310-")
+    assert platforms.tags_key(platforms.rank_tags(pypy)).startswith("pp39-")
+    assert platforms.tags_key(platforms.rank_tags(cpython)) != platforms.tags_key(
+        platforms.rank_tags(cpython[::-1])
+    )
+
+
+def test_tags_key__host_and_system_tags_differ():
+    # A build for the host's system still ranks fewer tags than the host,
+    # e.g. only glibc versions up to the one nixpkgs ships.
+    host = platforms.current_tag_priorities()
+    system = platforms.system_tag_priorities(
+        platforms.host_system(), sys.version_info[:2]
+    )
+    assert platforms.tags_key(host) != platforms.tags_key(system)
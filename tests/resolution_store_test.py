@@ -0,0 +1,105 @@
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from pipfreeze2nix.lockfile import LockedArtifact
+from pipfreeze2nix.resolution_store import GET_QUERY
+from pipfreeze2nix.resolution_store import ResolutionStore
+
+INDEX_URL = "https://pypi.org/simple/"
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def locked(name: str) -> LockedArtifact:
+    return LockedArtifact(
+        url=f"https://example.com/{name}",
+        hash=f"sha256-{name}",
+        artifact_format="wheel",
+    )
+
+
+def test_resolution_store__roundtrip(tmp_path):
+    store = ResolutionStore(tmp_path / "resolutions.sqlite3")
+    artifact = locked("zope.interface-5.4.0-py3-none-any.whl")
+    store.put(
+        INDEX_URL,
+        "Zope.Interface",
+        "5.4.0",
+        "x86_64-linux-cp310",
+        "zope.interface-5.4.0-py3-none-any.whl",
+        artifact,
+    )
+
+    assert store.get(INDEX_URL, "zope-interface", "5.4.0", "x86_64-linux-cp310") == (
+        artifact
+    )
+    assert (
+        store.get(INDEX_URL, "zope-interface", "5.4.0", "aarch64-darwin-cp310") is None
+    )
+    assert (
+        store.get(
+            "https://other/simple/", "zope-interface", "5.4.0", "x86_64-linux-cp310"
+        )
+        is None
+    )
+
+
+def test_resolution_store__persists(tmp_path):
+    artifact = locked("idna-3.4-py3-none-any.whl")
+    ResolutionStore(tmp_path / "resolutions.sqlite3").put(
+        INDEX_URL, "idna", "3.4", "x86_64-linux-cp310", "idna.whl", artifact
+    )
+
+    store = ResolutionStore(tmp_path / "resolutions.sqlite3")
+    assert store.get(INDEX_URL, "idna", "3.4", "x86_64-linux-cp310") == artifact
+
+
+def test_resolution_store__lookup_uses_primary_key(tmp_path):
+    store = ResolutionStore(tmp_path / "resolutions.sqlite3")
+    plan = (
+        store._connection()
+        .execute(f"EXPLAIN QUERY PLAN {GET_QUERY}", (INDEX_URL, "a", "1", "p"))
+        .fetchall()
+    )
+    assert "PRIMARY KEY" in str(plan)
+
+
+def test_resolution_store__shared_between_threads_and_stores(tmp_path):
+    path = tmp_path / "resolutions.sqlite3"
+    stores = [ResolutionStore(path), ResolutionStore(path)]
+
+    def write(worker: int) -> None:
+        store = stores[worker % 2]
+        for i in range(50):
+            name = f"package-{worker}-{i}"
+            store.put(INDEX_URL, name, "1.0", "x86_64-linux-cp310", name, locked(name))
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = ResolutionStore(path)
+    for worker in range(4):
+        for i in range(50):
+            name = f"package-{worker}-{i}"
+            assert store.get(INDEX_URL, name, "1.0", "x86_64-linux-cp310") == locked(
+                name
+            )
+
+
+def test_resolution_store__file_digests(tmp_path):
+    store = ResolutionStore(tmp_path / "resolutions.sqlite3")
+    assert store.get_file_digest("/wheels/a.whl", 10, 1) is None
+
+    store.put_file_digest("/wheels/a.whl", 10, 1, "abc")
+    assert store.get_file_digest("/wheels/a.whl", 10, 1) == "abc"
+    assert store.get_file_digest("/wheels/a.whl", 10, 2) is None
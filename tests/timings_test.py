@@ -0,0 +1,59 @@
+import json
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from pipfreeze2nix.timings import Recorder
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def test_recorder__disabled_records_nothing():
+    recorder = Recorder()
+    with recorder.span("resolve", name="requests") as args:
+        args["extra"] = 1
+    recorder.count("index_cache.hit")
+    assert recorder.spans() == []
+    assert recorder.counters() == {}
+
+
+def test_recorder__spans_and_counters():
+    recorder = Recorder(enabled=True)
+    with recorder.span("resolve", name="requests") as args:
+        args["bytes"] = 10
+    recorder.count("bytes_downloaded", 10)
+    recorder.count("bytes_downloaded", 5)
+
+    (span,) = recorder.spans()
+    assert span.name == "resolve"
+    assert span.args == {"name": "requests", "bytes": 10}
+    assert span.duration >= 0
+    assert recorder.counters() == {"bytes_downloaded": 15}
+
+
+def test_recorder__write_trace(tmp_path):
+    recorder = Recorder(enabled=True)
+
+    def resolve():
+        with recorder.span("resolve", name="requests"):
+            pass
+
+    with recorder.span("parse"):
+        pass
+    thread = threading.Thread(target=resolve)
+    thread.start()
+    thread.join()
+
+    recorder.write_trace(tmp_path / "trace.json")
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == ["parse", "resolve"]
+    assert [event["tid"] for event in events] == [0, 1]
+    assert all(event["ph"] == "X" for event in events)
+    assert events[1]["args"] == {"name": "requests"}
@@ -0,0 +1,109 @@
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+from urllib3 import PoolManager
+from urllib3.poolmanager import pool_classes_by_scheme
+
+from pipfreeze2nix import transport
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures_left = 0
+
+    def do_GET(self):
+        if FlakyHandler.failures_left > 0:
+            FlakyHandler.failures_left -= 1
+            status, body = 503, b"unavailable"
+        else:
+            status, body = 200, b"ok"
+
+        self.send_response(status)
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_transport__reuses_connections(server_url):
+    FlakyHandler.failures_left = 0
+    http = transport.Transport()
+    for _ in range(3):
+        assert http.get(server_url).content == b"ok"
+
+    stats = http.stats()
+    assert stats.requests == 3
+    assert stats.connections_opened == 1
+    assert stats.connections_reused == 2
+    assert stats.retries == 0
+
+
+def test_transport__stats_survive_pool_eviction(server_url):
+    FlakyHandler.failures_left = 0
+    http = transport.Transport()
+    http.get(server_url)
+    # The pool manager drops its least recently used pools beyond `pool_connections`.
+    http.adapter.poolmanager.clear()
+    http.get(server_url)
+
+    stats = http.stats()
+    assert stats.requests == 2
+    assert stats.connections_opened == 2
+    assert stats.connections_reused == 0
+
+
+def test_transport__counts_only_its_own_connections(server_url):
+    FlakyHandler.failures_left = 0
+    http = transport.Transport()
+    http.get(server_url)
+    proxy_manager = http.adapter.proxy_manager_for("http://127.0.0.1:1/")
+    assert http.adapter.proxy_manager_for("http://127.0.0.1:1/") is proxy_manager
+
+    for manager in (http.adapter.poolmanager, proxy_manager):
+        for scheme, pool_class in manager.pool_classes_by_scheme.items():
+            # Counted once, by a subclass of urllib3's own pool class.
+            assert pool_class.__bases__ == (pool_classes_by_scheme[scheme],)
+    assert PoolManager().pool_classes_by_scheme == pool_classes_by_scheme
+    assert requests.Session().get(server_url).content == b"ok"
+    assert http.stats().connections_opened == 1
+
+
+def test_transport__retries_retryable_status(server_url):
+    FlakyHandler.failures_left = 2
+    http = transport.Transport(backoff_factor=0)
+    response = http.get(server_url)
+    assert response.status_code == 200
+    assert http.stats().retries == 2
+
+
+def test_transport__gives_up_after_retries(server_url):
+    FlakyHandler.failures_left = 10
+    http = transport.Transport(retries=1, backoff_factor=0)
+    assert http.get(server_url).status_code == 503
+    assert http.stats().retries == 1
+
+
+def test_parse_retry_after():
+    assert transport.parse_retry_after(None) is None
+    assert transport.parse_retry_after("120") == 120.0
+    assert transport.parse_retry_after("garbage") is None
+    assert 50 < transport.parse_retry_after(formatdate(time.time() + 60)) <= 60
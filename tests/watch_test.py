@@ -0,0 +1,80 @@
+import os
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from pipfreeze2nix.watch import Inotify
+from pipfreeze2nix.watch import Watcher
+
+BACKENDS = [
+    pytest.param(False, id="poll"),
+    pytest.param(
+        True,
+        id="inotify",
+        marks=pytest.mark.skipif(
+            not Inotify.available(), reason="inotify is only available on Linux"
+        ),
+    ),
+]
+
+
+@pytest.fixture
+def tmp_path():
+    with TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+@pytest.fixture(params=BACKENDS)
+def use_inotify(request):
+    return request.param
+
+
+def make_watcher(paths, use_inotify):
+    return Watcher(paths, debounce=0.02, poll_interval=0.01, use_inotify=use_inotify)
+
+
+def test_watcher__reports_changed_file(tmp_path, use_inotify):
+    watched = tmp_path / "requirements.txt"
+    other = tmp_path / "other.txt"
+    watched.write_text("idna==3.3\n")
+    other.write_text("idna==3.3\n")
+
+    with make_watcher([watched, other], use_inotify) as watcher:
+        watched.write_text("idna==3.4\n")
+        assert watcher.wait(timeout=5) == {watched}
+
+
+def test_watcher__reports_replaced_file(tmp_path, use_inotify):
+    watched = tmp_path / "requirements.txt"
+    watched.write_text("idna==3.3\n")
+
+    with make_watcher([watched], use_inotify) as watcher:
+        replacement = tmp_path / "requirements.txt.tmp"
+        replacement.write_text("idna==3.4\n")
+        os.replace(replacement, watched)
+        assert watcher.wait(timeout=5) == {watched}
+
+
+def test_watcher__ignores_unchanged_contents(tmp_path, use_inotify):
+    watched = tmp_path / "requirements.txt"
+    watched.write_text("idna==3.3\n")
+
+    with make_watcher([watched], use_inotify) as watcher:
+        watched.write_text("idna==3.3\n")
+        (tmp_path / "requirements.nix").write_text("{}")
+        assert watcher.wait(timeout=0.2) == set()
+
+
+def test_watcher__waits_for_change(tmp_path, use_inotify):
+    watched = tmp_path / "requirements.txt"
+    watched.write_text("idna==3.3\n")
+
+    with make_watcher([watched], use_inotify) as watcher:
+        timer = threading.Timer(0.1, watched.write_text, args=("idna==3.4\n",))
+        timer.start()
+        try:
+            assert watcher.wait(timeout=5) == {watched}
+        finally:
+            timer.cancel()